@@ -0,0 +1,67 @@
+import json
+import random
+import sys
+import timeit
+from dacite import from_dict
+from models.players import LeaderBoard
+
+# compares LeaderBoard.from_data against the generic dacite path it replaced
+# usage: python -m benchmarks.bench_load [players] [max matches per player]
+
+
+def synthetic_board(players: int, max_matches: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    return {
+        "journal_seq": 0,
+        "players": [
+            {
+                "name": f"player{index}",
+                "playfab_id": f"{index:016X}",
+                "matches": [
+                    {
+                        "kills": rng.randint(0, 40),
+                        "deaths": rng.randint(0, 40),
+                        "structure_damage": rng.randint(0, 100),
+                        "score": rng.randint(0, 5000),
+                    }
+                    for _ in range(rng.randint(1, max_matches))
+                ],
+            }
+            for index in range(players)
+        ],
+        "max_items": 30,
+        "rank_config": {"0": "Bronze", "10000": "Silver", "50000": "Gold"},
+        "rank_short": {"0": "B", "10000": "S", "50000": "G"},
+    }
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    max_matches = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    data = json.loads(json.dumps(synthetic_board(players, max_matches)))
+    fast = LeaderBoard.from_data(data)
+    generic = from_dict(LeaderBoard, data, config=LeaderBoard.dacite_config)
+    assert fast.as_dict() == generic.as_dict()
+    results = {}
+    for name, load in (
+        ("from_data", lambda: LeaderBoard.from_data(data)),
+        (
+            "dacite",
+            lambda: from_dict(LeaderBoard, data, config=LeaderBoard.dacite_config),
+        ),
+    ):
+        runs = timeit.repeat(load, number=1, repeat=5)
+        results[name] = round(min(runs) * 1000, 3)
+    print(
+        json.dumps(
+            {
+                "players": players,
+                "matches": sum(len(p["matches"]) for p in data["players"]),
+                "best_ms": results,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
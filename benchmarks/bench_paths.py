@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from typing import Any, Callable
+from benchmarks.generator import SCALES, fake_board
+from models.players import LeaderBoard
+from models.storage import STORAGE_BACKENDS
+from parsers.board import get_table, get_table_chunks
+from parsers.main import compute_gate_text, split_chunks
+
+# times the hot paths of the bot against synthetic boards, prints json with
+# sorted keys so runs of different commits can be diffed or --compare'd
+# usage: python -m benchmarks.bench_paths [--scales small,medium] [--backends json,binary]
+#        [--repeat 5] [--seed 0] [--compare previous.json]
+LOOKUPS = 1000
+CHUNK_SIZE = 2000 - len("```\n\n```")
+
+
+def measure(run: Callable[[], Any], repeat: int, per_call: int = 1) -> dict[str, float]:
+    runs: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        runs.append((time.perf_counter() - start) * 1000 / per_call)
+    return {
+        "min_ms": round(min(runs), 4),
+        "median_ms": round(statistics.median(runs), 4),
+    }
+
+
+def board_class(directory: str, backend: str) -> type[LeaderBoard]:
+    path = os.path.join(directory, backend, "leaderboard.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return type(
+        f"Bench{backend.title()}LeaderBoard",
+        (LeaderBoard,),
+        {"storage_backend": backend, "get_path": classmethod(lambda cls: path)},
+    )
+
+
+def bench_storage(board: LeaderBoard, backend: str, repeat: int) -> dict[str, Any]:
+    loop = asyncio.new_event_loop()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            data_class = board_class(directory, backend)
+            data = data_class(
+                players=board.players,
+                max_items=board.max_items,
+                rank_config=board.rank_config,
+                rank_short=board.rank_short,
+            )
+            results: dict[str, Any] = {
+                "asave": measure(lambda: loop.run_until_complete(data.asave()), repeat),
+                "aload": measure(lambda: loop.run_until_complete(data_class.aload()), repeat),
+            }
+            results["size_bytes"] = loop.run_until_complete(data_class.afile_size())
+            data_class.get_storage().delete()
+            return results
+    finally:
+        loop.close()
+
+
+def bench_paths(board: LeaderBoard, repeat: int, seed: int) -> dict[str, Any]:
+    rng = random.Random(seed)
+    sample = rng.sample(board.players, min(LOOKUPS, len(board.players)))
+    queries = [
+        player.playfab_id if index % 2 else player.name.upper()
+        for (index, player) in enumerate(sample)
+    ]
+    gates = board.gate_table()
+    aliased_gates = board.gate_table(aliased=True)
+
+    def lookups():
+        for query in queries:
+            board.get_player(query)
+
+    def place():
+        for player in sample:
+            index = board.ranking.position(player)
+            start = max(0, index - 4)
+            stop = min(len(board.ranking), index + 5)
+            get_table(board.ranking.window(start, stop), aliased_gates, start, stop - start, sort=False)
+
+    def score():
+        for player in sample:
+            board.ranking.count_above(player.total_score)
+            gates.current(player.total_score)
+            gates.next(player.total_score)
+
+    def gate_text():
+        for player in sample:
+            compute_gate_text(player.total_score, board.rank_config)
+
+    full_table = get_table(
+        board.ranking.window(0, LOOKUPS), aliased_gates, 0, LOOKUPS, sort=False
+    )
+    return {
+        "get_player": measure(lookups, repeat, len(queries)),
+        "get_table": measure(
+            lambda: get_table(
+                board.ranking.window(0, board.max_items),
+                aliased_gates,
+                0,
+                board.max_items,
+                sort=False,
+            ),
+            repeat,
+        ),
+        "place": measure(place, repeat, len(sample)),
+        "score": measure(score, repeat, len(sample)),
+        "compute_gate_text": measure(gate_text, repeat, len(sample)),
+        "split_chunks": measure(lambda: split_chunks(full_table, CHUNK_SIZE), repeat),
+        "get_table_chunks": measure(
+            lambda: get_table_chunks(
+                board.ranking.window(0, LOOKUPS), aliased_gates, 0, LOOKUPS, sort=False
+            ),
+            repeat,
+        ),
+    }
+
+
+def compare(results: dict[str, Any], previous: dict[str, Any]):
+    # adds median_ms / previous median_ms next to every timing found in both
+    for key, value in results.items():
+        before = previous.get(key)
+        if not isinstance(value, dict) or not isinstance(before, dict):
+            continue
+        if "median_ms" in value and before.get("median_ms"):
+            value["ratio"] = round(value["median_ms"] / before["median_ms"], 3)
+        else:
+            compare(value, before)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_paths")
+    parser.add_argument("--scales", default="small,medium")
+    parser.add_argument("--backends", default=",".join(STORAGE_BACKENDS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+    results: dict[str, Any] = {
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "scales": {},
+    }
+    for scale in args.scales.split(","):
+        board = fake_board(LeaderBoard, scale, args.seed)
+        results["scales"][scale] = {
+            "players": len(board.players),
+            "matches": sum(len(player.matches) for player in board.players),
+            "config": SCALES[scale],
+            "paths": bench_paths(board, args.repeat, args.seed),
+            "storage": {
+                backend: bench_storage(board, backend, args.repeat)
+                for backend in args.backends.split(",")
+            },
+        }
+    if args.compare:
+        with open(args.compare, "r", encoding="utf8") as previous_file:
+            compare(results, json.loads(previous_file.read()))
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
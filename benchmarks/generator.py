@@ -0,0 +1,58 @@
+from array import array
+from faker import Faker
+import numpy as np
+from models.players import MATCH_COLUMNS, LeaderBoard, MatchList, Player
+
+# synthetic leaderboards for the benchmarks, same seed gives the same board
+SCALES: dict[str, tuple[int, int, int]] = {
+    # players, min matches, max matches per player
+    "small": (100, 10, 500),
+    "medium": (5_000, 10, 500),
+    "large": (50_000, 10, 500),
+}
+MATCH_RANGES: dict[str, tuple[int, int]] = {
+    "kills": (0, 40),
+    "deaths": (0, 40),
+    "structure_damage": (0, 100),
+    "score": (0, 5000),
+}
+RANKS = ["Bronze", "Silver", "Gold", "Platinum", "Diamond", "Master", "Legend"]
+
+
+def fake_players(
+    players: int, min_matches: int, max_matches: int, seed: int = 0
+) -> list[Player]:
+    fake = Faker()
+    fake.seed_instance(seed)
+    rng = np.random.default_rng(seed)
+    match_counts = rng.integers(min_matches, max_matches, players, endpoint=True)
+    columns = {
+        column: rng.integers(low, high, int(match_counts.sum()), dtype=np.int32, endpoint=True)
+        for (column, (low, high)) in MATCH_RANGES.items()
+    }
+    result: list[Player] = []
+    offset = 0
+    for index, match_count in enumerate(match_counts.tolist()):
+        matches = MatchList()
+        for column in MATCH_COLUMNS:
+            getattr(matches, column).extend(
+                array("i", columns[column][offset: offset + match_count].tobytes())
+            )
+        offset += match_count
+        # suffix keeps names unique, get_player refuses duplicates
+        result.append(Player(f"{fake.user_name()}{index}", f"{fake.random_int(0, 2**63):016X}", matches))
+    return result
+
+
+def fake_board(
+    board_class: type[LeaderBoard], scale: str, seed: int = 0
+) -> LeaderBoard:
+    (players, min_matches, max_matches) = SCALES[scale]
+    board = board_class(players=fake_players(players, min_matches, max_matches, seed))
+    top_score = max((player.total_score for player in board.players), default=0)
+    for index, rank in enumerate(RANKS):
+        gate = str(top_score * index // len(RANKS))
+        board.rank_config[gate] = rank
+        assert board.rank_short is not None
+        board.rank_short[gate] = rank[:2].upper()
+    return board
@@ -2,16 +2,24 @@ import discord
 import discord.ext.commands as commands
 import os
 from dotenv import load_dotenv
-import math
 import asyncio
-from table2ascii import table2ascii as t2a
-from models.players import LeaderBoard, Player, GameMatch
+import time
+from typing import Any, Coroutine
+from functools import partial
+from models.archive import aread_archive, awrite_archive
+from models.boards import BoardRegistry, ResidentBoards
+from models.metrics import METRICS
+from models.outbound import BOARD, CLEANUP, Outbound
+from models.players import DEFAULT_BOARD, LeaderBoard, GameMatch, Player
+from models.profiling import PROFILER
+from models.writer import Writer
+from parsers.board import RenderCache, human_format
+from parsers.pages import LazyPages, page_count
 from parsers.main import (
-    compute_next_gate_text,
-    compute_gate_text,
+    content_hash,
     make_ordinal,
+    parse_match_rows,
     sizeof_fmt,
-    split_chunks,
 )
 from aiofiles import open as aopen, os as aos
 from discord.ext.pages import Paginator, Page
@@ -26,52 +34,156 @@ CHANNEL_ID = int(channel_id_raw) if channel_id_raw.isnumeric() else 0
 CONFIG_BOT_CHANNEL_ID = (
     int(config_bot_channel_id_raw) if config_bot_channel_id_raw.isnumeric() else 0
 )
+# board re-render waits for this many seconds without mutations, but never
+# more than BOARD_REFRESH_MAX_DELAY after the first one
+BOARD_REFRESH_DELAY = float(os.environ.get("BOARD_REFRESH_DELAY", "3"))
+BOARD_REFRESH_MAX_DELAY = float(os.environ.get("BOARD_REFRESH_MAX_DELAY", "30"))
+# fetches of the previous run's board messages failing for other reasons than
+# the message being deleted are retried this many times before giving up
+RESTORE_ATTEMPTS = 3
+# a board whose start failed is started again after this many seconds,
+# doubling up to BOARD_RESTART_MAX_DELAY while it keeps failing
+BOARD_RESTART_DELAY = 30.0
+BOARD_RESTART_MAX_DELAY = 600.0
+# serves prometheus metrics on 127.0.0.1:METRICS_PORT when set
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+# boards kept loaded at once, the least recently used idle ones are unloaded
+MAX_RESIDENT_BOARDS = int(os.environ.get("MAX_RESIDENT_BOARDS", "4"))
+# rows per /top page, keeps a page well under the message size limit
+TOP_PAGE_SIZE = 20
+LeaderBoard.storage_backend = os.environ.get("STORAGE_BACKEND", "json")
+print(f"LOADING STORAGE BACKEND {LeaderBoard.storage_backend}")
 bot = discord.Bot()
 
 
-def custom_format(number: float, precision: int):
-    if number == 0:
-        return "0"
-    elif number < 1:
-        return f"{number:.{precision}f}".rstrip("0").rstrip(".")
-    else:
-        integer_part = int(number)
-        decimal_part = number - integer_part
-        if decimal_part == 0:
-            return str(integer_part)
-        else:
-            return f"{integer_part}.{str(decimal_part)[2:precision+2]}"
-
-
-def human_format(number: int, min: int = 1000) -> str:
-    if number < min:
-        return str(number)
-    units = ["", "K", "M", "G", "T", "P"]
-    k = 1000.0
-    magnitude = int(math.floor(math.log(number, k)))
-    formatted_number = custom_format(number / k**magnitude, 1)
-    return "{}{}".format(formatted_number, units[magnitude])
-
-
 def rank_2_emoji(n: int):
     rank_emoji_map = {0: ":first_place:", 1: ":second_place:", 2: ":third_place:"}
     rank_out = rank_emoji_map.get(n, make_ordinal(n + 1))
     return rank_out
 
 
-class Leaderboard(commands.Cog):
-    bot: discord.Bot
+class BoardChannel:
+    # one board, the channel it is posted in and the messages showing it
     channel: discord.abc.Messageable | None = None
     _messages: list[discord.Message]
-    _file_path = "./persist/leaderboard_msg_id"
+    # last content hash sent per message id, rebuilt from the messages on restore
+    _hashes: dict[int, str]
 
-    def __init__(self, bot: discord.Bot):
-        self.bot = bot
-        self._last_member = None
+    def __init__(self, cog: "Leaderboard", data_class: type[LeaderBoard], channel_id: int):
+        self.cog = cog
+        self.data_class = data_class
+        self.name = data_class.board_name
+        self.channel_id = channel_id
+        self._file_path = os.path.join(
+            os.path.dirname(data_class.get_path()), "leaderboard_msg_id"
+        )
         self._messages = []
+        self._hashes = {}
+        self.renders = RenderCache()
+        self.writer = Writer(data_class)
+        self._board_lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+        self._dirty_since: float | None = None
+        self._dirty_at: float | None = None
+        self._restart_task: asyncio.Task | None = None
+        self._restart_delay = BOARD_RESTART_DELAY
+        self.outbound = cog.outbound
 
-    def cog_unload(self):
-        return super().cog_unload()
+    async def aget(self) -> LeaderBoard:
+        return await self.cog.resident.aget(self.data_class)
+
+    @property
+    def idle(self) -> bool:
+        return (
+            self.writer.idle
+            and not self.data_class.get_storage().compacting
+            and not self._board_lock.locked()
+            and (self._refresh_task is None or self._refresh_task.done())
+        )
+
+    async def start(self):
+        try:
+            await self._start()
+        except Exception:
+            # until then refreshes have no channel to post in
+            self.schedule_restart()
+            raise
+        self._restart_delay = BOARD_RESTART_DELAY
+
+    def schedule_restart(self):
+        if self._restart_task is not None and not self._restart_task.done():
+            return
+        self._restart_task = self.cog._spawn(self._restart(self._restart_delay))
+        self._restart_delay = min(self._restart_delay * 2, BOARD_RESTART_MAX_DELAY)
+
+    async def _restart(self, delay: float):
+        await asyncio.sleep(delay)
+        # lets a failing start schedule the next attempt
+        self._restart_task = None
+        if self.channel is not None:
+            return
+        try:
+            await self.start()
+        except Exception as e:
+            print(f"Failed to restart board {self.name}. {e}")
+
+    async def _start(self):
+        if not self.channel_id:
+            return
+        channel = await self.cog.bot.fetch_channel(self.channel_id)
+        if not isinstance(channel, discord.abc.Messageable):
+            print(f"Channel {self.channel_id} of board {self.name} can't hold messages")
+            return
+        self.channel = channel
+        # on_ready fires again after reconnects, messages are still known then
+        if not self._messages:
+            try:
+                await self.restore_messages()
+            except Exception:
+                # posting now would duplicate the messages that could not be
+                # fetched, the board stays down until it is started again
+                self.channel = None
+                raise
+        self.cog._spawn(self.send_board())
+
+    def stop(self) -> asyncio.Future:
+        # takes the board messages down, its data stays on disk
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        if self._restart_task is not None:
+            self._restart_task.cancel()
+        msg_ids = [msg.id for msg in self._messages]
+        self._messages = []
+        self._hashes = {}
+        return self.outbound.submit(CLEANUP, "delete", partial(self.delete_messages, msg_ids))
+
+    def request_refresh(self):
+        # marks the board dirty, a single background task re-renders it once
+        # mutations go quiet for BOARD_REFRESH_DELAY seconds
+        now = asyncio.get_running_loop().time()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        self._dirty_at = now
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_board())
+
+    async def _refresh_board(self):
+        loop = asyncio.get_running_loop()
+        while self._dirty_at is not None and self._dirty_since is not None:
+            due = min(
+                self._dirty_at + BOARD_REFRESH_DELAY,
+                self._dirty_since + BOARD_REFRESH_MAX_DELAY,
+            )
+            remaining = due - loop.time()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+                continue
+            self._dirty_since = None
+            self._dirty_at = None
+            try:
+                await self.send_board()
+            except Exception as e:
+                print(f"Failed to refresh board {self.name}. {e}")
 
     async def write_msg_ids(self):
         if self._messages is None:
@@ -79,146 +191,360 @@ class Leaderboard(commands.Cog):
         async with aopen(self._file_path, "w") as file:
             await file.write("\n".join([str(msg.id) for msg in self._messages]))
 
-    async def delete_msg(self, msg_id: str):
+    async def read_msg_ids(self) -> list[str]:
+        # one id per line, files of older versions may carry a content hash
+        # after it, hashes are recomputed from the fetched messages instead
+        file_exists = await aos.path.exists(self._file_path)
+        if not file_exists:
+            return []
+        async with aopen(self._file_path, "r") as file:
+            lines = await file.readlines()
+        return [line.split()[0] for line in lines if line.strip()]
+
+    async def delete_messages(self, msg_ids: list[int]):
+        # bulk deletes 100 at a time, one by one where bulk is unavailable
+        # (other channel types, messages older than 14 days)
+        channel = self.channel
+        if isinstance(channel, (discord.TextChannel, discord.Thread, discord.VoiceChannel)):
+            for start in range(0, len(msg_ids), 100):
+                batch = msg_ids[start: start + 100]
+                try:
+                    await channel.delete_messages([discord.Object(id=msg_id) for msg_id in batch])
+                    METRICS.inc("discord_deleted", len(batch), call="bulk")
+                    continue
+                except discord.HTTPException as e:
+                    print(f"Bulk delete failed, deleting one by one. {e}")
+                for msg_id in batch:
+                    await self.delete_msg(channel.get_partial_message(msg_id))
+        elif channel is not None:
+            for msg_id in msg_ids:
+                try:
+                    msg = await channel.fetch_message(msg_id)
+                except Exception as e:
+                    print(f"Failed to fetch msg {msg_id}. {e}")
+                    continue
+                await self.delete_msg(msg)
+
+    async def delete_msg(self, msg: discord.Message | discord.PartialMessage):
         try:
-            if not msg_id.isdecimal() or not self.channel:
-                return
-            parsed_msg_id = int(msg_id)
-            msg = await self.channel.fetch_message(parsed_msg_id)
             await msg.delete()
+            METRICS.inc("discord_deleted", call="single")
         except Exception as e:
-            print(f"Failed to delete previous msg {msg_id}. {e}")
+            print(f"Failed to delete msg {msg.id}. {e}")
 
-    async def delete_previous_messages(self) -> str | None:
-        if self.channel is None:
-            return
-        try:
-            file_exists = await aos.path.exists(self._file_path)
-            if not file_exists:
-                return
-            msg_ids: list[str] = []
-            async with aopen(self._file_path, "r") as file:
-                msg_ids = await file.readlines()
+    async def restore_messages(self) -> bool:
+        # picks the board messages of the previous run back up so send_board
+        # edits them in place, when any of them was deleted the rest is deleted
+        # too and the board gets posted again to keep the chunks in order
+        # other fetch errors (rate limits, outages, permissions) are retried
+        # and then raised without deleting anything
+        channel = self.channel
+        if channel is None:
+            return False
+        msg_ids = [int(id) for id in await self.read_msg_ids() if id.isdecimal()]
+        if not msg_ids:
+            return False
+        fetched: dict[int, discord.Message | None] = {}
+        for attempt in range(RESTORE_ATTEMPTS):
+            pending = [msg_id for msg_id in msg_ids if msg_id not in fetched]
+            results = await asyncio.gather(
+                *(
+                    self.outbound.submit(BOARD, "fetch", partial(channel.fetch_message, msg_id))
+                    for msg_id in pending
+                ),
+                return_exceptions=True,
+            )
+            error: BaseException | None = None
+            for msg_id, result in zip(pending, results):
+                if isinstance(result, discord.Message):
+                    fetched[msg_id] = result
+                elif isinstance(result, discord.NotFound):
+                    fetched[msg_id] = None
+                else:
+                    error = result
+            if error is None:
+                break
+            if attempt + 1 == RESTORE_ATTEMPTS:
+                raise error
+            print(f"Failed to fetch leaderboard messages, retrying. {error}")
+            await asyncio.sleep(2**attempt)
+        messages = [msg for msg in (fetched[msg_id] for msg_id in msg_ids) if msg is not None]
+        if len(messages) < len(msg_ids):
+            print(f"{len(msg_ids) - len(messages)} leaderboard messages are gone, posting it again")
+            await self.outbound.submit(
+                CLEANUP, "delete", partial(self.delete_messages, [msg.id for msg in messages])
+            )
+            return False
+        self._messages = messages
+        self._hashes = {msg.id: content_hash(msg.content) for msg in messages}
+        return True
 
-            tasks = [self.delete_msg(id.strip()) for id in msg_ids]
-            await asyncio.gather(*tasks)
-        except Exception as e:
-            print(e)
+    async def send_board(
+        self, existing_leaderboard: LeaderBoard | None = None, force_rewrite=False
+    ):
+        async with self._board_lock:
+            edits = await self._send_board(existing_leaderboard, force_rewrite)
+        # edits are only queued, waiting outside the lock lets the next render
+        # supersede the ones that did not go out yet
+        await asyncio.gather(*edits, return_exceptions=True)
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        print("Leaderboard is ready!")
-        channel = await self.bot.fetch_channel(CHANNEL_ID)
-        if isinstance(channel, discord.abc.Messageable):
-            self.channel = channel
-            await self.delete_previous_messages()
-            asyncio.create_task(self.send_board())
-
-    def get_row(self, player_data: Player, ranks: dict[str, str]):
-        kills: int = player_data.total_kills
-        deaths: int = player_data.total_deaths
-        score = player_data.total_score
-        (_, rank_txt) = compute_gate_text(
-            score, dict([(str(k), v) for (k, v) in ranks.items()])
+    def edit_msg(self, msg: discord.Message, content: str) -> asyncio.Future:
+        chunk_hash = self._hashes[msg.id] = content_hash(content)
+        METRICS.inc("discord_bytes", len(content.encode("utf8")), call="edit")
+        edit = self.outbound.submit(
+            BOARD, "edit", partial(msg.edit, content=content), key=("edit", msg.id)
         )
-        return [
-            player_data.name,
-            rank_txt or "None",
-            score,
-            kills,
-            deaths,
-        ]
 
-    def get_table(
-        self,
-        players: list[Player],
-        ranks: dict[str, str],
-        start: int = 0,
-        limit: int = 10,
-        sort: bool = True,
-    ):
-        top_players = (
-            sorted(players, key=lambda x: x.total_score, reverse=True)
-            if sort
-            else list(players)
-        )
-        board_data = [self.get_row(value, ranks) for value in top_players[:limit]]
-        all_table = t2a(
-            header=["#", "Name", "Rank", "Score", "K", "D"],
-            body=[
-                [
-                    start + index + 1,
-                    dt[0],
-                    dt[1],
-                    human_format(dt[2], 10000),
-                    human_format(dt[3], 10000),
-                    human_format(dt[4], 10000),
-                ]
-                for (index, dt) in enumerate(board_data)
-            ],
-        )
-        return all_table
+        def forget_failed(done: asyncio.Future):
+            # makes the next render retry the edit
+            if done.cancelled() or done.exception() is not None:
+                if self._hashes.get(msg.id) == chunk_hash:
+                    self._hashes.pop(msg.id)
 
-    async def send_board(
+        edit.add_done_callback(forget_failed)
+        return edit
+
+    async def _send_board(
         self, existing_leaderboard: LeaderBoard | None = None, force_rewrite=False
-    ):
-        if not self.channel:
-            return
+    ) -> list[asyncio.Future]:
+        channel = self.channel
+        if not channel:
+            return []
         if force_rewrite:
             self._messages = []
+            self._hashes = {}
         leaderboard_data = existing_leaderboard
         if not leaderboard_data:
-            leaderboard_data = await LeaderBoard.aload()
-        all_table = self.get_table(
-            leaderboard_data.players,
-            leaderboard_data.aliased_ranks(),
-            0,
-            leaderboard_data.max_items,
+            leaderboard_data = await self.aget()
+        chunks = self.renders.get_chunks(
+            leaderboard_data, 0, leaderboard_data.max_items
         )
 
-        chunk_size = 2000 - len("```\n\n```")
-        chunks = map(lambda x: "```\n" + x + "```", split_chunks(all_table, chunk_size))
-
         msgs_to_drop: list[discord.Message] = list(self._messages)
+        edits: list[asyncio.Future] = []
         rewrite = False
         for index, table_chunk in enumerate(chunks):
-            msg: discord.Message | None = None
             if index < len(self._messages):
                 msg = self._messages[index]
                 msgs_to_drop.remove(msg)
-                await msg.edit(content=table_chunk)
+                if self._hashes.get(msg.id) == content_hash(table_chunk):
+                    METRICS.inc("discord_skipped_edits")
+                    continue
+                edits.append(self.edit_msg(msg, table_chunk))
             else:
-                msg = await self.channel.send(table_chunk)
-                rewrite = True
+                # sends stay in order, they decide the order of the messages
+                msg = await self.outbound.submit(
+                    BOARD, "send", lambda: channel.send(table_chunk)
+                )
+                METRICS.inc("discord_bytes", len(table_chunk.encode("utf8")), call="send")
                 self._messages.append(msg)
+                self._hashes[msg.id] = content_hash(table_chunk)
+            rewrite = True
         if len(msgs_to_drop):
             for msg in msgs_to_drop:
                 print(f"Dropping msg {msg.id}")
                 self._messages.remove(msg)
-                asyncio.create_task(msg.delete())
+                self._hashes.pop(msg.id, None)
+            self.outbound.submit(
+                CLEANUP,
+                "delete",
+                partial(self.delete_messages, [msg.id for msg in msgs_to_drop]),
+            )
             rewrite = True
         if rewrite:
-            asyncio.create_task(self.write_msg_ids())
+            self.cog._spawn(self.write_msg_ids())
+        return edits
+
+
+class Leaderboard(commands.Cog):
+    bot: discord.Bot
+    boards: dict[str, BoardChannel]
+
+    def __init__(self, bot: discord.Bot):
+        self.bot = bot
+        self._last_member = None
+        # every discord request made for the boards goes through outbound,
+        # other background work is tracked in _tasks
+        self.outbound = Outbound()
+        self._tasks: set[asyncio.Task] = set()
+        self.resident = ResidentBoards(MAX_RESIDENT_BOARDS, self.can_evict)
+        self.boards = {DEFAULT_BOARD: BoardChannel(self, LeaderBoard, CHANNEL_ID)}
+
+    def _spawn(self, coroutine: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def cog_unload(self):
+        self.outbound.close()
+        for task in self._tasks:
+            task.cancel()
+        return super().cog_unload()
+
+    def can_evict(self, data_class: type[LeaderBoard]) -> bool:
+        board = self.boards.get(data_class.board_name)
+        return board is None or board.idle
+
+    def board_for(
+        self,
+        ctx: discord.ApplicationContext | discord.AutocompleteContext,
+        name: str = "",
+    ) -> BoardChannel | None:
+        # the named board, else the one posted in the channel of ctx, else the default one
+        if name:
+            return self.boards.get(name.strip().lower())
+        for board in self.boards.values():
+            if board.channel_id and board.channel_id == ctx.interaction.channel_id:
+                return board
+        return self.boards[DEFAULT_BOARD]
+
+    async def load_boards(self):
+        registry = await BoardRegistry.aget()
+        for name, channel_id in registry.boards.items():
+            if name not in self.boards:
+                self.boards[name] = BoardChannel(self, LeaderBoard.named(name), channel_id)
+
+    async def add_board(self, name: str, channel_id: int) -> BoardChannel:
+        if name in self.boards:
+            raise ValueError(f"Board {name} already exists")
+        board = BoardChannel(self, LeaderBoard.named(name), channel_id)
+        registry = await BoardRegistry.aget()
+        registry.boards[name] = channel_id
+        await registry.asave()
+        self.boards[name] = board
+        await board.start()
+        return board
+
+    async def remove_board(self, name: str):
+        if name == DEFAULT_BOARD:
+            raise ValueError("The default board can't be removed")
+        board = self.boards.pop(name, None)
+        if board is None:
+            raise ValueError(f"Board {name} doesn't exist")
+        registry = await BoardRegistry.aget()
+        registry.boards.pop(name, None)
+        await registry.asave()
+        self.resident.forget(board.data_class)
+        await board.stop()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        print("Leaderboard is ready!")
+        await self.load_boards()
+        for board in list(self.boards.values()):
+            try:
+                await board.start()
+            except Exception as e:
+                print(f"Failed to start board {board.name}. {e}")
 
 
+_command_starts: dict[int, float] = {}
+
+
+# listeners have to be coroutines even when they never await
+@bot.listen()
+async def on_application_command(ctx: discord.ApplicationContext):  # noqa: ASYNC124
+    _command_starts[ctx.interaction.id] = time.perf_counter()
+
+
+def observe_command(ctx: discord.ApplicationContext, outcome: str):
+    start = _command_starts.pop(ctx.interaction.id, None)
+    if start is None:
+        return
+    name = ctx.command.qualified_name if ctx.command else "unknown"
+    METRICS.observe("command_seconds", time.perf_counter() - start, command=name)
+    METRICS.inc("commands", command=name, outcome=outcome)
+
+
+@bot.listen()
+async def on_application_command_completion(ctx: discord.ApplicationContext):  # noqa: ASYNC124
+    observe_command(ctx, "ok")
+
+
+@bot.listen()
+async def on_application_command_error(  # noqa: ASYNC124
+    ctx: discord.ApplicationContext, error: discord.DiscordException
+):
+    observe_command(ctx, "error")
+
+
+# invoke hooks run inline around the command callback, unlike listeners
+@bot.before_invoke
+async def profile_before(ctx: discord.ApplicationContext):  # noqa: ASYNC124
+    if PROFILER.command is not None and ctx.command is not None:
+        PROFILER.start(ctx.interaction.id, ctx.command.qualified_name)
+
+
+@bot.after_invoke
+async def profile_after(ctx: discord.ApplicationContext):  # noqa: ASYNC124
+    if PROFILER.command is not None:
+        PROFILER.stop(ctx.interaction.id)
+
+
+@bot.listen("on_ready")
+async def start_metrics_server():
+    global metrics_server
+    if not METRICS_PORT or metrics_server is not None:
+        return
+    try:
+        metrics_server = await METRICS.serve("127.0.0.1", METRICS_PORT)
+        print(f"Serving metrics on 127.0.0.1:{METRICS_PORT}")
+    except Exception as e:
+        print(f"Failed to start metrics server. {e}")
+
+
+metrics_server: asyncio.Server | None = None
+
 # region admin commands
 admin_cmds = bot.create_group("mng", "Admin commands")
 discordLeaderboard = Leaderboard(bot)
 
 
+async def player_choices(ctx: discord.AutocompleteContext) -> list[str]:
+    # runs on every keystroke, answered from the board's prefix index
+    try:
+        with METRICS.timer("autocomplete_seconds", option="playfab_or_user_name"):
+            target = discordLeaderboard.board_for(ctx, ctx.options.get("board") or "")
+            if target is None:
+                return []
+            config = await target.aget()
+            return config.suggest_players(ctx.value or "")
+    except Exception as e:
+        print(e)
+        return []
+
+
 @admin_cmds.command(
-    description="reload board, force_rewrite=true will send new messages instead trying to edit current ones"
+    description="reload board, force_rewrite=true posts new messages, reload_data=true rereads the data file"
 )
 @discord.default_permissions(administrator=True)
 @discord.guild_only()
-async def reload(ctx: discord.ApplicationContext, force_rewrite: bool = False):
+async def reload(
+    ctx: discord.ApplicationContext,
+    force_rewrite: bool = False,
+    reload_data: bool = False,
+    board: str = "",
+):
     try:
         if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
             await ctx.respond("Unauthorized")
             return
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
         await ctx.defer()
-        config = await LeaderBoard.aload()
-        await discordLeaderboard.send_board(config, force_rewrite)
+        if reload_data:
+            target.data_class.invalidate()
+        if target.channel is None and target.channel_id:
+            # its start failed before, raises again when it still does
+            await target.start()
+            if target.channel is None:
+                await ctx.respond(f"Channel {target.channel_id} of board {target.name} can't hold messages")
+                return
+        config = await target.aget()
+        await target.send_board(config, force_rewrite)
         await ctx.respond("Done")
     except Exception as e:
         print(e)
@@ -233,20 +559,21 @@ async def set_rank(
     score_gate: int,
     rank_name: str,
     short_name: str | None = None,
+    board: str = "",
 ):
     try:
         if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
             await ctx.respond("Unauthorized")
             return
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
         await ctx.defer()
-        config = await LeaderBoard.aload()
-        config.rank_config[str(score_gate)] = rank_name
-        if short_name:
-            if not config.rank_short:
-                config.rank_short = dict()
-            config.rank_short[str(score_gate)] = short_name
-        await config.asave()
-        await discordLeaderboard.send_board(config)
+        await target.writer.submit(
+            lambda config: config.set_rank(score_gate, rank_name, short_name)
+        )
+        target.request_refresh()
         await ctx.respond("Done")
     except Exception as e:
         print(e)
@@ -256,16 +583,18 @@ async def set_rank(
 @admin_cmds.command(description="delete rank score gate")
 @discord.default_permissions(administrator=True)
 @discord.guild_only()
-async def del_rank(ctx: discord.ApplicationContext, score_gate: int):
+async def del_rank(ctx: discord.ApplicationContext, score_gate: int, board: str = ""):
     try:
         if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
             await ctx.respond("Unauthorized")
             return
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
         await ctx.defer()
-        config = await LeaderBoard.aload()
-        config.rank_config.pop(str(score_gate))
-        await config.asave()
-        await discordLeaderboard.send_board(config)
+        await target.writer.submit(lambda config: config.del_rank(score_gate))
+        target.request_refresh()
         await ctx.respond("Done")
     except Exception as e:
         print(e)
@@ -275,16 +604,18 @@ async def del_rank(ctx: discord.ApplicationContext, score_gate: int):
 @admin_cmds.command(description="set max leaderboard rows")
 @discord.default_permissions(administrator=True)
 @discord.guild_only()
-async def max_leaderboard(ctx: discord.ApplicationContext, max: int):
+async def max_leaderboard(ctx: discord.ApplicationContext, max: int, board: str = ""):
     try:
         if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
             await ctx.respond("Unauthorized")
             return
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
         await ctx.defer()
-        config = await LeaderBoard.aload()
-        config.max_items = max
-        await config.asave()
-        await discordLeaderboard.send_board(config)
+        await target.writer.submit(lambda config: config.set_max_items(max))
+        target.request_refresh()
         await ctx.respond("Done")
     except Exception as e:
         print(e)
@@ -294,17 +625,28 @@ async def max_leaderboard(ctx: discord.ApplicationContext, max: int):
 @admin_cmds.command(description="add player to the system")
 @discord.default_permissions(administrator=True)
 @discord.guild_only()
-async def add_player(ctx: discord.ApplicationContext, playfab_id: str, user_name: str):
+async def add_player(
+    ctx: discord.ApplicationContext,
+    playfab_id: str,
+    user_name: str,
+    board: str = "",
+):
     try:
         if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
             await ctx.respond("Unauthorized")
             return
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
         await ctx.defer()
-        config = await LeaderBoard.aload()
-        config.players.append(Player(user_name.strip(), playfab_id.strip()))
-        await config.asave()
-        await discordLeaderboard.send_board(config)
+        await target.writer.submit(
+            lambda config: config.add_player(user_name.strip(), playfab_id.strip())
+        )
+        target.request_refresh()
         await ctx.respond("Done")
+    except ValueError as e:
+        await ctx.respond(f"{e}.")
     except Exception as e:
         print(e)
         await ctx.respond("ERROR")
@@ -313,28 +655,32 @@ async def add_player(ctx: discord.ApplicationContext, playfab_id: str, user_name
 @admin_cmds.command(description="removes player from the system")
 @discord.default_permissions(administrator=True)
 @discord.guild_only()
+@discord.option("playfab_or_user_name", autocomplete=player_choices)
 async def rm_player(
     ctx: discord.ApplicationContext,
     playfab_or_user_name: str,
+    board: str = "",
 ):
     try:
         if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
             await ctx.respond("Unauthorized")
             return
-        await ctx.defer()
-        config = await LeaderBoard.aload()
-        player = config.get_player(playfab_or_user_name)
-        if player is None:
-            await ctx.respond(
-                f"Couldn't find player by id/name {playfab_or_user_name}."
-            )
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
             return
-        config.players.remove(player)
-        await config.asave()
-        await discordLeaderboard.send_board(config)
-        await ctx.respond(
-            f"Done. Removed player {player.name} ({player.playfab_id}) from the system."
-        )
+        await ctx.defer()
+
+        def operation(config: LeaderBoard) -> str:
+            player = config.get_player(playfab_or_user_name)
+            if player is None:
+                return f"Couldn't find player by id/name {playfab_or_user_name}."
+            config.rm_player(player)
+            return f"Done. Removed player {player.name} ({player.playfab_id}) from the system."
+
+        response = await target.writer.submit(operation)
+        target.request_refresh()
+        await ctx.respond(response)
     except Exception as e:
         print(e)
         await ctx.respond("ERROR")
@@ -343,34 +689,35 @@ async def rm_player(
 @admin_cmds.command(description="deletes player match")
 @discord.default_permissions(administrator=True)
 @discord.guild_only()
+@discord.option("playfab_or_user_name", autocomplete=player_choices)
 async def del_match(
     ctx: discord.ApplicationContext,
     playfab_or_user_name: str,
     match_number: int,
+    board: str = "",
 ):
     try:
         if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
             await ctx.respond("Unauthorized")
             return
-        await ctx.defer()
-        config = await LeaderBoard.aload()
-        player = config.get_player(playfab_or_user_name)
-        if player is None:
-            await ctx.respond(
-                f"Couldn't find player by id/name {playfab_or_user_name}. Run `/mng add_player` first to add player."
-            )
-            return
-        if match_number > len(player.matches):
-            await ctx.respond(
-                f"Match number {match_number} is out of bounds. Player {player.name} has {len(player.matches)} matches.",
-            )
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
             return
-        player.matches.pop(match_number - 1)
-        await config.asave()
-        await discordLeaderboard.send_board(config)
-        await ctx.respond(
-            f"Done. Deleted {make_ordinal(match_number)} match for {player.name} ({player.playfab_id})."
-        )
+        await ctx.defer()
+
+        def operation(config: LeaderBoard) -> str:
+            player = config.get_player(playfab_or_user_name)
+            if player is None:
+                return f"Couldn't find player by id/name {playfab_or_user_name}. Run `/mng add_player` first to add player."
+            if match_number > len(player.matches):
+                return f"Match number {match_number} is out of bounds. Player {player.name} has {len(player.matches)} matches."
+            config.del_match(player, match_number - 1)
+            return f"Done. Deleted {make_ordinal(match_number)} match for {player.name} ({player.playfab_id})."
+
+        response = await target.writer.submit(operation)
+        target.request_refresh()
+        await ctx.respond(response)
     except Exception as e:
         print(e)
         await ctx.respond("ERROR")
@@ -379,6 +726,7 @@ async def del_match(
 @admin_cmds.command(description="edit player match")
 @discord.default_permissions(administrator=True)
 @discord.guild_only()
+@discord.option("playfab_or_user_name", autocomplete=player_choices)
 async def edit_match(
     ctx: discord.ApplicationContext,
     playfab_or_user_name: str,
@@ -387,38 +735,39 @@ async def edit_match(
     score: int | None = None,
     kills: int | None = None,
     deaths: int | None = None,
+    board: str = "",
 ):
     try:
         if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
             await ctx.respond("Unauthorized")
             return
-        await ctx.defer()
-        config = await LeaderBoard.aload()
-        player = config.get_player(playfab_or_user_name)
-        if player is None:
-            await ctx.respond(
-                f"Couldn't find player by id/name {playfab_or_user_name}. Run `/mng add_player` first to add player."
-            )
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
             return
-        if match_number > len(player.matches):
-            await ctx.respond(
-                f"Match number {match_number} is out of bounds. Player {player.name} has {len(player.matches)} matches.",
+        await ctx.defer()
+
+        def operation(config: LeaderBoard) -> str:
+            player = config.get_player(playfab_or_user_name)
+            if player is None:
+                return f"Couldn't find player by id/name {playfab_or_user_name}. Run `/mng add_player` first to add player."
+            if match_number > len(player.matches):
+                return f"Match number {match_number} is out of bounds. Player {player.name} has {len(player.matches)} matches."
+            config.edit_match(
+                player,
+                match_number - 1,
+                structure_damage=structure_damage_percent,
+                score=score,
+                kills=kills,
+                deaths=deaths,
             )
-            return
-        match = player.matches[match_number - 1]
-        if structure_damage_percent is not None:
-            match.structure_damage = structure_damage_percent
-        if score is not None:
-            match.score = score
-        if kills is not None:
-            match.kills = kills
-        if deaths is not None:
-            match.deaths = deaths
-        await config.asave()
-        await discordLeaderboard.send_board(config)
-        await ctx.respond(
-            f"Done. Edited {make_ordinal(match_number)} match for {player.name} ({player.playfab_id})."
-        )
+            return f"Done. Edited {make_ordinal(match_number)} match for {player.name} ({player.playfab_id})."
+
+        response = await target.writer.submit(operation)
+        target.request_refresh()
+        await ctx.respond(response)
+    except ValueError as e:
+        await ctx.respond(f"{e}.")
     except Exception as e:
         print(e)
         await ctx.respond("ERROR")
@@ -427,6 +776,7 @@ async def edit_match(
 @admin_cmds.command(description="add player match score")
 @discord.default_permissions(administrator=True)
 @discord.guild_only()
+@discord.option("playfab_or_user_name", autocomplete=player_choices)
 async def add_match(
     ctx: discord.ApplicationContext,
     playfab_or_user_name: str,
@@ -434,26 +784,135 @@ async def add_match(
     score: int = 0,
     kills: int = 0,
     deaths: int = 0,
+    board: str = "",
 ):
     try:
         if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
             await ctx.respond("Unauthorized")
             return
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
         await ctx.defer()
-        config = await LeaderBoard.aload()
-        player = config.get_player(playfab_or_user_name)
-        if player is None:
-            await ctx.respond(
-                f"Couldn't find player by id/name {playfab_or_user_name}. Run `/mng add_player` first to add player"
+
+        def operation(config: LeaderBoard) -> str:
+            player = config.get_player(playfab_or_user_name)
+            if player is None:
+                return f"Couldn't find player by id/name {playfab_or_user_name}. Run `/mng add_player` first to add player"
+            match_data = GameMatch(kills, deaths, structure_damage_percent, score)
+            config.add_match(player, match_data)
+            return f"Done. Added {make_ordinal(len(player.matches))} match for {player.name} ({player.playfab_id})."
+
+        response = await target.writer.submit(operation)
+        target.request_refresh()
+        await ctx.respond(response)
+    except ValueError as e:
+        await ctx.respond(f"{e}.")
+    except Exception as e:
+        print(e)
+        await ctx.respond("ERROR")
+
+
+@admin_cmds.command(
+    description="add matches from a csv/json of playfab_or_user_name, score, kills, deaths, structure_damage rows"
+)
+@discord.default_permissions(administrator=True)
+@discord.guild_only()
+async def import_matches(
+    ctx: discord.ApplicationContext,
+    file: discord.Attachment,
+    skip_invalid: bool = False,
+    board: str = "",
+):
+    try:
+        if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
+            await ctx.respond("Unauthorized")
+            return
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
+        await ctx.defer()
+        content = (await file.read()).decode("utf8")
+        (rows, parse_errors) = parse_match_rows(content, file.filename)
+
+        def operation(config: LeaderBoard) -> tuple[int, list[str]]:
+            errors = list(parse_errors)
+            resolved: list[tuple[Player, GameMatch]] = []
+            for row in rows:
+                player = config.get_player(row.playfab_or_user_name)
+                if player is None:
+                    errors.append(
+                        f"Row {row.line}: couldn't find player by id/name {row.playfab_or_user_name}"
+                    )
+                    continue
+                resolved.append(
+                    (
+                        player,
+                        GameMatch(
+                            row.kills, row.deaths, row.structure_damage, row.score
+                        ),
+                    )
+                )
+            if errors and not skip_invalid:
+                return (0, errors)
+            for player, match_data in resolved:
+                config.add_match(player, match_data)
+            return (len(resolved), errors)
+
+        (imported, errors) = await target.writer.submit(operation)
+        if imported:
+            target.request_refresh()
+        response = f"Done. Imported {imported} matches."
+        if errors:
+            response = (
+                f"Imported {imported} matches, {len(errors)} rows have errors"
+                + ("" if skip_invalid else ", nothing was imported")
+                + ":\n"
             )
+            errors_txt = "\n".join(errors)
+            max_errors_len = 2000 - len(response) - len("```\n\n```")
+            if len(errors_txt) > max_errors_len:
+                errors_txt = errors_txt[: max_errors_len - 4] + "\n..."
+            response += "```\n" + errors_txt + "\n```"
+        await ctx.respond(response)
+    except ValueError as e:
+        await ctx.respond(f"Couldn't read {file.filename}. {e}")
+    except Exception as e:
+        print(e)
+        await ctx.respond("ERROR")
+
+
+@admin_cmds.command(
+    description="close the season, matches move to the archive, totals and rankings stay the same"
+)
+@discord.default_permissions(administrator=True)
+@discord.guild_only()
+async def new_season(ctx: discord.ApplicationContext, board: str = ""):
+    try:
+        if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
+            await ctx.respond("Unauthorized")
             return
-        match_data = GameMatch(kills, deaths, structure_damage_percent, score)
-        player.matches.append(match_data)
-        await config.asave()
-        await discordLeaderboard.send_board(config)
-        await ctx.respond(
-            f"Done. Added {make_ordinal(len(player.matches))} match for {player.name} ({player.playfab_id})."
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
+        await ctx.defer()
+        config = await target.aget()
+        season = config.season
+        captured = config.season_matches()
+        # the archive is written first, a season only closes once its matches are safe
+        await awrite_archive(target.data_class.get_archive_path(), season, captured)
+        archived = await target.writer.submit(
+            lambda config: config.close_season(season, captured)
         )
+        # rewrites the snapshot without the archived matches
+        config = await target.aget()
+        await config.asave()
+        await ctx.respond(f"Done. Archived {archived} matches, season {config.season} started.")
+    except ValueError as e:
+        await ctx.respond(f"{e}.")
     except Exception as e:
         print(e)
         await ctx.respond("ERROR")
@@ -464,17 +923,22 @@ async def add_match(
 @discord.guild_only()
 async def metadata(
     ctx: discord.ApplicationContext,
+    board: str = "",
 ):
     try:
         if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
             await ctx.respond("Unauthorized")
             return
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
         await ctx.defer()
-        config = await LeaderBoard.aload()
-        file_size = await LeaderBoard.afile_size()
+        config = await target.aget()
+        file_size = await target.data_class.afile_size()
         embed = discord.Embed(title="Metadata", color=15844367)
-        embed.description = f"Data file size: {sizeof_fmt(file_size)}"
-        max_matches = max([len(p.matches) for p in config.players])
+        embed.description = f"Data file size: {sizeof_fmt(file_size)}\nSeason {config.season}"
+        max_matches = max([p.match_count for p in config.players])
         embed.add_field(
             name=f"{len(config.players)} players in the system",
             value=f"Max {max_matches} matches played",
@@ -485,15 +949,149 @@ async def metadata(
         await ctx.respond("ERROR")
 
 
+@admin_cmds.command(description="show command, storage and discord latencies")
+@discord.default_permissions(administrator=True)
+@discord.guild_only()
+async def perf(
+    ctx: discord.ApplicationContext,
+):
+    try:
+        if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
+            await ctx.respond("Unauthorized")
+            return
+        embed = discord.Embed(title="Performance", color=15844367)
+        latency_lines = [
+            f"{name} {' '.join(value for (_, value) in labels)}: {count}x "
+            + f"p50 {p50 * 1000:.1f}ms p95 {p95 * 1000:.1f}ms p99 {p99 * 1000:.1f}ms"
+            for (name, labels, count, p50, p95, p99) in METRICS.summary()
+        ]
+        counter_lines = [
+            f"{name} {' '.join(value for (_, value) in labels)}: "
+            + (sizeof_fmt(value) if name.endswith("bytes") else f"{value:g}")
+            for (name, series) in sorted(METRICS.counters.items())
+            for (labels, value) in sorted(series.items())
+        ]
+        embed.description = (
+            "```\n" + ("\n".join(latency_lines) or "No samples yet")[:3900] + "\n```"
+        )
+        if counter_lines:
+            embed.add_field(
+                name="Counters",
+                value="```\n" + "\n".join(counter_lines)[:1000] + "\n```",
+                inline=False,
+            )
+        await ctx.respond(embed=embed)
+    except Exception as e:
+        print(e)
+        await ctx.respond("ERROR")
+
+
+@admin_cmds.command(
+    description="profile a fraction of a command's invocations into persist/profiles, no command turns it off"
+)
+@discord.default_permissions(administrator=True)
+@discord.guild_only()
+async def profile(
+    ctx: discord.ApplicationContext,
+    command: str = "",
+    rate: float = 0.1,
+    retention: int = 20,
+):
+    try:
+        if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
+            await ctx.respond("Unauthorized")
+            return
+        if not command:
+            PROFILER.configure(None)
+            await ctx.respond("Profiling off")
+            return
+        if not 0 < rate <= 1 or retention < 1:
+            await ctx.respond("rate must be in (0, 1] and retention at least 1")
+            return
+        PROFILER.configure(command, rate, retention)
+        await ctx.respond(
+            f"Profiling {rate:.0%} of /{PROFILER.command} into {PROFILER.directory}, keeping the last {retention}"
+        )
+    except Exception as e:
+        print(e)
+        await ctx.respond("ERROR")
+
+
+@admin_cmds.command(description="add a named board posted in channel, other commands take it as board")
+@discord.default_permissions(administrator=True)
+@discord.guild_only()
+async def add_board(
+    ctx: discord.ApplicationContext,
+    name: str,
+    channel: discord.TextChannel,
+):
+    try:
+        if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
+            await ctx.respond("Unauthorized")
+            return
+        await ctx.defer()
+        name = name.strip().lower()
+        await discordLeaderboard.add_board(name, channel.id)
+        await ctx.respond(f"Done. Board {name} is posted in {channel.mention}.")
+    except ValueError as e:
+        await ctx.respond(f"{e}.")
+    except Exception as e:
+        print(e)
+        await ctx.respond("ERROR")
+
+
+@admin_cmds.command(description="remove a named board and its messages, its data is kept")
+@discord.default_permissions(administrator=True)
+@discord.guild_only()
+async def rm_board(ctx: discord.ApplicationContext, name: str):
+    try:
+        if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
+            await ctx.respond("Unauthorized")
+            return
+        await ctx.defer()
+        name = name.strip().lower()
+        await discordLeaderboard.remove_board(name)
+        await ctx.respond(f"Done. Removed board {name}.")
+    except ValueError as e:
+        await ctx.respond(f"{e}.")
+    except Exception as e:
+        print(e)
+        await ctx.respond("ERROR")
+
+
+@admin_cmds.command(description="list boards and which of them are loaded")
+@discord.default_permissions(administrator=True)
+@discord.guild_only()
+async def boards(ctx: discord.ApplicationContext):
+    try:
+        if CONFIG_BOT_CHANNEL_ID and ctx.channel_id != CONFIG_BOT_CHANNEL_ID:
+            await ctx.respond("Unauthorized")
+            return
+        lines = [
+            f"{name}: "
+            + (f"<#{board.channel_id}>" if board.channel_id else "no channel")
+            + (" (loaded)" if board.data_class.is_resident() else "")
+            for (name, board) in discordLeaderboard.boards.items()
+        ]
+        await ctx.respond("\n".join(lines))
+    except Exception as e:
+        print(e)
+        await ctx.respond("ERROR")
+
+
 # endregion
 
 
 @bot.slash_command(description="show all available ranks")
 @discord.default_permissions(send_messages=True)
 @discord.guild_only()
-async def ranks(ctx: discord.ApplicationContext):
+async def ranks(ctx: discord.ApplicationContext, board: str = ""):
     try:
-        config = await LeaderBoard.aload()
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
+        config = await target.aget()
         all_ranks_txt = "\n".join(
             f"{txt} - {pts} points"
             for (pts, txt) in sorted(
@@ -510,80 +1108,137 @@ async def ranks(ctx: discord.ApplicationContext):
 @bot.slash_command(description="show player leaderboard placement")
 @discord.default_permissions(send_messages=True)
 @discord.guild_only()
-async def place(ctx: discord.ApplicationContext, playfab_or_user_name: str):
+@discord.option("playfab_or_user_name", autocomplete=player_choices)
+async def place(
+    ctx: discord.ApplicationContext,
+    playfab_or_user_name: str,
+    board: str = "",
+):
     try:
-        config = await LeaderBoard.aload()
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
+        config = await target.aget()
         player = config.get_player(playfab_or_user_name)
         if player is None:
             await ctx.respond(f"Couldn't find player by id/name {playfab_or_user_name}")
             return
-        if len(player.matches) < 1:
+        if player.match_count < 1:
             await ctx.respond(f"No matches found with {playfab_or_user_name}")
             return
-        sorted_players = sorted(
-            config.players, key=lambda p: p.total_score, reverse=True
-        )
-        p_index = sorted_players.index(player)
+        p_index = config.ranking.position(player)
         place_start = max(0, p_index - 4)
-        place_end = min(len(sorted_players), p_index + 5)
-        snippet = sorted_players[place_start:place_end]
-        table = discordLeaderboard.get_table(
-            snippet, config.aliased_ranks(), place_start, sort=False
-        )
+        place_end = min(len(config.ranking), p_index + 5)
+        table = target.renders.get_table(config, place_start, place_end)
         await ctx.respond("```\n" + table + "\n```")
     except Exception as e:
         print(e)
         await ctx.respond("ERROR")
 
 
+@bot.slash_command(description="browse the full leaderboard")
+@discord.default_permissions(send_messages=True)
+@discord.guild_only()
+async def top(ctx: discord.ApplicationContext, board: str = ""):
+    try:
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
+        config = await target.aget()
+        if len(config.ranking) < 1:
+            await ctx.respond("Leaderboard is empty")
+            return
+
+        def make_page(page_index: int) -> Page:
+            start = page_index * TOP_PAGE_SIZE
+            table = target.renders.get_table(
+                config, start, start + TOP_PAGE_SIZE
+            )
+            return Page(content="```\n" + table + "\n```")
+
+        pages = LazyPages(page_count(len(config.ranking), TOP_PAGE_SIZE), make_page)
+        if len(pages) == 1:
+            await ctx.respond(pages[0].content)
+            return
+        paginator = Paginator(pages=pages.as_list(), author_check=True)
+        await paginator.respond(ctx.interaction)
+    except Exception as e:
+        print(e)
+        await ctx.respond("ERROR")
+
+
 @bot.slash_command(description="show player match history")
 @discord.default_permissions(send_messages=True)
 @discord.guild_only()
-async def mh(ctx: discord.ApplicationContext, playfab_or_user_name: str):
+@discord.option("playfab_or_user_name", autocomplete=player_choices)
+async def mh(
+    ctx: discord.ApplicationContext,
+    playfab_or_user_name: str,
+    archived: bool = False,
+    board: str = "",
+):
     try:
-        config = await LeaderBoard.aload()
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
+        config = await target.aget()
         player = config.get_player(playfab_or_user_name)
         if player is None:
             await ctx.respond(f"Couldn't find player by id/name {playfab_or_user_name}")
             return
-        if len(player.matches) < 1:
-            await ctx.respond(f"No matches found with {playfab_or_user_name}")
-            return
+        title = "Match History"
         matches = player.matches
+        if archived:
+            if player.archived.matches < 1:
+                await ctx.respond(f"No archived matches found with {playfab_or_user_name}")
+                return
+            # previous seasons are only kept in the cold archive
+            title = "Archived Match History"
+            matches = await aread_archive(
+                target.data_class.get_archive_path(),
+                player.playfab_id,
+                config.season,
+                player.archived.matches,
+            )
+        elif len(player.matches) < 1:
+            await ctx.respond(
+                f"No matches found with {playfab_or_user_name}"
+                + (" this season, use archived to see older ones" if player.archived.matches else "")
+            )
+            return
         chunk_size = 10
         description = f"{player.name} ({player.playfab_id})"
-        embeds: list[discord.Embed] = []
-        for chunk_index, chunk in enumerate(
-            list(
-                [
-                    matches[i: i + chunk_size]
-                    for i in range(0, len(matches), chunk_size)
-                ]
-            )
-        ):
+
+        def make_embed(chunk_index: int) -> discord.Embed:
             embed = discord.Embed(
-                title="Match History",
+                title=title,
                 color=15844367,
                 description=description,
             )
             base_line = chunk_index * chunk_size
-            for index, match in enumerate(chunk):
+            for index, match in enumerate(matches[base_line: base_line + chunk_size]):
                 embed.add_field(
                     name=f"{make_ordinal(base_line +index + 1)} match",
                     value=f"Score: {match.score} | Kills: {match.kills} | Deaths: {match.deaths} | Structure Damage: {match.structure_damage}%",
                     inline=False,
                 )
             embed.set_footer(text="Use /score to check aggregated stats")
-            embeds.append(embed)
-        if len(embeds) == 1:
-            await ctx.respond(embed=embeds[0])
-        elif len(embeds) > 1:
-            paginator = Paginator(
-                pages=[Page(embeds=[em]) for em in embeds], author_check=True
-            )
+            return embed
+
+        pages = LazyPages(
+            page_count(len(matches), chunk_size),
+            lambda chunk_index: Page(embeds=[make_embed(chunk_index)]),
+        )
+        if len(pages) == 1:
+            await ctx.respond(embed=make_embed(0))
+        elif len(pages) > 1:
+            paginator = Paginator(pages=pages.as_list(), author_check=True)
             await paginator.respond(ctx.interaction)
         else:
-            raise Exception(f"{ctx.command}: Unexpected embed length {len(embeds)}")
+            raise Exception(f"{ctx.command}: Unexpected embed length {len(pages)}")
         # await ctx.respond(embed=embed)
 
     except Exception as e:
@@ -594,19 +1249,26 @@ async def mh(ctx: discord.ApplicationContext, playfab_or_user_name: str):
 @bot.slash_command(description="show player score stats")
 @discord.default_permissions(send_messages=True)
 @discord.guild_only()
-async def score(ctx: discord.ApplicationContext, playfab_or_user_name: str):
+@discord.option("playfab_or_user_name", autocomplete=player_choices)
+async def score(
+    ctx: discord.ApplicationContext,
+    playfab_or_user_name: str,
+    board: str = "",
+):
     try:
-        config = await LeaderBoard.aload()
+        target = discordLeaderboard.board_for(ctx, board)
+        if target is None:
+            await ctx.respond(f"Unknown board {board}")
+            return
+        config = await target.aget()
         player = config.get_player(playfab_or_user_name)
         if player is None:
             await ctx.respond(f"Couldn't find player by id/name {playfab_or_user_name}")
             return
-        if len(player.matches) < 1:
+        if player.match_count < 1:
             await ctx.respond(f"No matches found with {playfab_or_user_name}")
             return
-        players_above = len(
-            [p for p in config.players if p.total_score > player.total_score]
-        )
+        players_above = config.ranking.count_above(player.total_score)
         rank_txt = rank_2_emoji(players_above)
         embed = discord.Embed(
             title="Score",
@@ -616,14 +1278,9 @@ async def score(ctx: discord.ApplicationContext, playfab_or_user_name: str):
             color=15844367,
         )
 
-        rank_gates = dict([(str(k), v) for (k, v) in config.rank_config.items()])
-        (_, rank_txt) = compute_gate_text(
-            player.total_score,
-            rank_gates,
-        )
-        (next_rank_pts, next_rank) = compute_next_gate_text(
-            player.total_score, rank_gates
-        )
+        rank_gates = config.gate_table()
+        (_, rank_txt) = rank_gates.current(player.total_score)
+        (next_rank_pts, next_rank) = rank_gates.next(player.total_score)
         embed.add_field(name="Rank", value=rank_txt or "None")
         if next_rank and next_rank_pts:
             embed.add_field(
@@ -632,7 +1289,7 @@ async def score(ctx: discord.ApplicationContext, playfab_or_user_name: str):
             )
         embed.add_field(name=chr(173), value=chr(173))
         embed.add_field(
-            name=f"{len(player.matches)} matches played",
+            name=f"{player.match_count} matches played",
             value=f"{player.total_kills} Kills | {player.total_deaths} Deaths | {player.avg_structure_damage}% Avg Structure Dmg",
         )
         embed.set_footer(text="Use /mh to check match history")
@@ -1,64 +1,147 @@
-from dataclasses import dataclass
+import asyncio
+from dataclasses import dataclass, field
 import json
 import os
-import aiofiles
-from aiofiles import os as aos
-from dacite import from_dict
+from dacite import Config, from_dict
+from itertools import count
+from typing import Any, ClassVar, Self, cast
+from models.metrics import METRICS
+from models.storage import STORAGE_BACKENDS, Storage
+
+# process-wide so a reloaded instance never reuses an older instance's version
+_versions = count(1)
 
 
 @dataclass
 class IOBoundDataclass:
+    # process-wide resident instances, keyed by class, see aget/invalidate
+    _resident: ClassVar[dict[type, "IOBoundDataclass"]] = {}
+    _resident_locks: ClassVar[dict[type, asyncio.Lock]] = {}
+    _storages: ClassVar[dict[type, Storage]] = {}
+    # key of models.storage.STORAGE_BACKENDS, set before first use
+    storage_backend: ClassVar[str] = "json"
+    # journaled classes append mutations (see mutate/acommit) to a log next to
+    # the snapshot instead of rewriting it, the log is folded back into the
+    # snapshot once it grows past journal_threshold bytes
+    journaled: ClassVar[bool] = False
+    journal_threshold: ClassVar[int] = 1024 * 1024
+    dacite_config: ClassVar[Config | None] = None
+    # seq of the last journal entry already folded into the snapshot
+    journal_seq: int = field(default=0, kw_only=True)
+
+    def __post_init__(self):
+        self._version = next(_versions)
+        self._pending: list[dict[str, Any]] = []
+
+    @classmethod
+    def get_storage(cls) -> Storage:
+        storage = cls._storages.get(cls)
+        if storage is None:
+            storage = STORAGE_BACKENDS[cls.storage_backend](cls)
+            cls._storages[cls] = storage
+        return storage
+
     @classmethod
     def delete(cls):
-        os.remove(cls.get_path())
+        cls.invalidate()
+        cls.get_storage().delete()
 
     @classmethod
     async def adelete(cls):
-        await aos.remove(cls.get_path())
+        cls.invalidate()
+        await cls.get_storage().adelete()
 
     @classmethod
     def exists(cls):
-        return os.path.exists(cls.get_path())
+        return cls.get_storage().exists()
 
     @classmethod
     async def aexists(cls):
-        exists = await aos.path.exists(cls.get_path())
+        exists = await cls.get_storage().aexists()
         return exists
 
     def as_dict(self):
-        return self.__dict__.copy()
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    @classmethod
+    def from_data(cls, data: dict[str, Any]) -> Self:
+        return from_dict(data_class=cls, data=data, config=cls.dacite_config)
+
+    @property
+    def version(self) -> int:
+        # changes on every applied mutation, use it to key derived caches
+        return self._version
+
+    def apply(self, entry: dict[str, Any]) -> Any:
+        raise NotImplementedError(
+            "apply method must be implemented in child class to support mutations"
+        )
+
+    def mutate(self, entry: dict[str, Any]) -> Any:
+        # applies entry in memory and queues it for the next acommit
+        result = self.apply(entry)
+        self._version = next(_versions)
+        self.journal_seq += 1
+        self._pending.append({**entry, "seq": self.journal_seq})
+        return result
+
+    def _replay(self, lines: list[str]) -> bool:
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # torn tail from a crash mid-append, nothing after it was committed
+                print(f"Ignoring unreadable journal entry {line[:64]!r}")
+                return False
+            if entry["seq"] <= self.journal_seq:
+                continue
+            self.apply(entry)
+            self._version = next(_versions)
+            self.journal_seq = entry["seq"]
+        return True
 
     def save(self):
-        with open(self.get_path(), "w", encoding="utf8") as config_file:
-            json.dump(self.as_dict(), config_file)
+        self._pending.clear()
+        self.get_storage().save(self)
+        self._resident[type(self)] = self
 
     async def asave(self):
-        async with aiofiles.open(self.get_path(), "w", encoding="utf8") as config_file:
-            await config_file.write(json.dumps(self.as_dict()))
+        self._pending.clear()
+        try:
+            with METRICS.timer("storage_seconds", op="asave", data=type(self).__name__):
+                await self.get_storage().asave(self)
+        except Exception:
+            self._drop_resident()
+            raise
+        self._resident[type(self)] = self
+
+    async def acommit(self):
+        # persists mutations queued by mutate, appending them to the journal
+        # when journaled, rewriting the snapshot otherwise
+        entries = self._pending
+        self._pending = []
+        try:
+            with METRICS.timer("storage_seconds", op="acommit", data=type(self).__name__):
+                await self.get_storage().acommit(self, entries)
+        except Exception:
+            self._drop_resident()
+            raise
+        self._resident[type(self)] = self
+
+    def _drop_resident(self):
+        # after a failed write memory is ahead of disk, and journal entries
+        # refer to players by index, so the next aget reloads what was written
+        if self._resident.get(type(self)) is self:
+            type(self).invalidate()
 
     @classmethod
     def _load(cls):
-        if not cls.exists():
-            return cls()
-        json_data: dict = {}
-        path = cls.get_path()
-        with open(path, "r", encoding="utf8") as config_file:
-            json_data = json.loads(config_file.read())
-        config_data = from_dict(data_class=cls, data=json_data)
-        return config_data
+        return cls.get_storage().load()
 
     @classmethod
     async def _aload(cls):
-        exists = await cls.aexists()
-        if not exists:
-            return cls()
-        path = cls.get_path()
-        json_data: dict = {}
-        async with aiofiles.open(path, "r", encoding="utf8") as config_file:
-            content = await config_file.read()
-            json_data = json.loads(content)
-        config_data = from_dict(data_class=cls, data=json_data)
-        return config_data
+        with METRICS.timer("storage_seconds", op="aload", data=cls.__name__):
+            return await cls.get_storage().aload()
 
     @classmethod
     def load(cls):
@@ -66,18 +149,42 @@ class IOBoundDataclass:
 
     @classmethod
     async def afile_size(cls):
-        exists = await cls.aexists()
-        if not exists:
-            return 0
-        file_size = await aos.path.getsize(cls.get_path())
+        file_size = await cls.get_storage().asize()
         return file_size
 
     @classmethod
     def aload(cls):
         return cls._aload()
 
+    @classmethod
+    async def aget(cls) -> Self:
+        # loads once and keeps serving the same instance until invalidated,
+        # mutate it in place and asave/acommit it to persist
+        resident = cls._resident.get(cls)
+        if resident is not None:
+            return cast(Self, resident)
+        lock = cls._resident_locks.setdefault(cls, asyncio.Lock())
+        async with lock:
+            resident = cls._resident.get(cls)
+            if resident is None:
+                resident = await cls.aload()
+                cls._resident[cls] = resident
+        return cast(Self, resident)
+
+    @classmethod
+    def invalidate(cls):
+        cls._resident.pop(cls, None)
+
+    @classmethod
+    def is_resident(cls) -> bool:
+        return cls in cls._resident
+
     @classmethod
     def get_path(cls) -> str:
         raise NotImplementedError(
             "get_path classmethod must be implemented in child class"
         )
+
+    @classmethod
+    def get_journal_path(cls) -> str:
+        return os.path.splitext(cls.get_path())[0] + ".journal.jsonl"
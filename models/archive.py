@@ -0,0 +1,68 @@
+import asyncio
+import json
+import os
+from models.metrics import METRICS
+from models.players import MATCH_COLUMNS, MatchList, Player
+
+# cold archive of closed seasons, one json line per player and season:
+#   {"season": 1, "playfab_id": "...", "kills": [...], "deaths": [...], ...}
+# only read on demand (/mh archived), the board keeps the totals
+# lines of a season that was not closed (failed rollover) are ignored, a
+# season written twice keeps its last line
+
+
+def write_archive(path: str, season: int, captured: list[tuple[Player, MatchList]]):
+    size = 0
+    with open(path, "a", encoding="utf8") as archive_file:
+        for player, matches in captured:
+            line = (
+                json.dumps(
+                    {
+                        "season": season,
+                        "playfab_id": player.playfab_id,
+                        **{column: list(getattr(matches, column)) for column in MATCH_COLUMNS},
+                    }
+                )
+                + "\n"
+            )
+            archive_file.write(line)
+            size += len(line.encode("utf8"))
+        archive_file.flush()
+        os.fsync(archive_file.fileno())
+    METRICS.inc("storage_bytes", size, op="append", storage="archive")
+
+
+async def awrite_archive(path: str, season: int, captured: list[tuple[Player, MatchList]]):
+    with METRICS.timer("storage_seconds", op="archive", data="archive"):
+        await asyncio.to_thread(write_archive, path, season, captured)
+
+
+def read_archive(path: str, playfab_id: str, season: int, count: int) -> MatchList:
+    # the last count archived matches of playfab_id from seasons before season,
+    # older lines belong to a removed player that had the same id
+    matches = MatchList()
+    if not os.path.exists(path):
+        return matches
+    needle = json.dumps(playfab_id)
+    seasons: dict[int, dict] = {}
+    with open(path, "r", encoding="utf8") as archive_file:
+        for line in archive_file:
+            if needle not in line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry["playfab_id"] == playfab_id and entry["season"] < season:
+                seasons[entry["season"]] = entry
+    for archived_season in sorted(seasons):
+        for column in MATCH_COLUMNS:
+            getattr(matches, column).extend(seasons[archived_season][column])
+    if len(matches) > count:
+        matches.take(len(matches) - count)
+    return matches
+
+
+async def aread_archive(path: str, playfab_id: str, season: int, count: int) -> MatchList:
+    with METRICS.timer("storage_seconds", op="read_archive", data="archive"):
+        return await asyncio.to_thread(read_archive, path, playfab_id, season, count)
@@ -0,0 +1,49 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+from models.IOBoundDataclass import IOBoundDataclass
+from models.players import LeaderBoard
+
+
+@dataclass
+class BoardRegistry(IOBoundDataclass):
+    # named boards besides the default one, name -> leaderboard channel id
+    boards: dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def get_path(cls) -> str:
+        return "./persist/boards.json"
+
+
+class ResidentBoards:
+    # LRU of the boards kept in memory, past max_resident the least recently
+    # used ones can_evict allows are invalidated and load again on next use
+    def __init__(
+        self, max_resident: int, can_evict: Callable[[type[LeaderBoard]], bool]
+    ):
+        self.max_resident = max_resident
+        self.can_evict = can_evict
+        self._used: OrderedDict[type[LeaderBoard], None] = OrderedDict()
+
+    async def aget(self, data_class: type[LeaderBoard]) -> LeaderBoard:
+        board = await data_class.aget()
+        self._used[data_class] = None
+        self._used.move_to_end(data_class)
+        self.evict()
+        return board
+
+    def evict(self):
+        resident = [board for board in self._used if board.is_resident()]
+        for data_class in resident[:-1]:
+            if len(resident) <= self.max_resident:
+                break
+            if self.can_evict(data_class):
+                print(f"Evicting idle board {data_class.board_name}")
+                data_class.invalidate()
+                resident.remove(data_class)
+        for data_class in [board for board in self._used if not board.is_resident()]:
+            del self._used[data_class]
+
+    def forget(self, data_class: type[LeaderBoard]):
+        self._used.pop(data_class, None)
+        data_class.invalidate()
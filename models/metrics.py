@@ -0,0 +1,140 @@
+import asyncio
+from bisect import bisect_left
+from contextlib import contextmanager
+import time
+from typing import Iterator
+
+# latency buckets in seconds, growing 25% from 0.5ms to ~55s so quantiles
+# are within a few % of the real value, exported as prometheus buckets too
+BUCKETS = tuple(0.0005 * 1.25**index for index in range(53))
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        # linear interpolation inside the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1] * 2
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return BUCKETS[-1]
+
+
+class Metrics:
+    # process-wide latency histograms and counters, keyed by name and labels
+    def __init__(self):
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self.counters: dict[str, dict[Labels, float]] = {}
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        series = self.histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(seconds)
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        series = self.counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        # observes the time spent in the block, failed blocks included
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def summary(self) -> list[tuple[str, Labels, int, float, float, float]]:
+        # (name, labels, count, p50, p95, p99) per histogram
+        return [
+            (
+                name,
+                labels,
+                histogram.count,
+                histogram.quantile(0.5),
+                histogram.quantile(0.95),
+                histogram.quantile(0.99),
+            )
+            for (name, series) in sorted(self.histograms.items())
+            for (labels, histogram) in sorted(series.items())
+        ]
+
+    def render_prometheus(self) -> str:
+        lines: list[str] = []
+        for name, series in sorted(self.histograms.items()):
+            lines.append(f"# TYPE lb_{name} histogram")
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(
+                    (*(f"{bucket:.6g}" for bucket in BUCKETS), "+Inf"), histogram.counts
+                ):
+                    cumulative += bucket_count
+                    lines.append(
+                        f"lb_{name}_bucket{format_labels((*labels, ('le', bound)))} {cumulative}"
+                    )
+                lines.append(f"lb_{name}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"lb_{name}_count{format_labels(labels)} {histogram.count}")
+        for name, series in sorted(self.counters.items()):
+            lines.append(f"# TYPE lb_{name} counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"lb_{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host: str, port: int) -> asyncio.Server:
+        # bare bones http server answering every request with the metrics
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                body = self.render_prometheus().encode("utf8")
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    + b"Content-Type: text/plain; version=0.0.4\r\n"
+                    + f"Content-Length: {len(body)}\r\n".encode("ascii")
+                    + b"Connection: close\r\n\r\n"
+                    + body
+                )
+                await writer.drain()
+            except Exception as e:
+                print(f"Failed to serve metrics. {e}")
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        key
+        + '="'
+        + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        + '"'
+        for (key, value) in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+METRICS = Metrics()
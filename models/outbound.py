@@ -0,0 +1,114 @@
+import asyncio
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from itertools import count
+import time
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+from models.metrics import METRICS
+
+# lower runs first, command replies are not queued here, interaction
+# responses have their own rate limits and never wait on board traffic
+BOARD = 0
+CLEANUP = 1
+
+R = TypeVar("R")
+
+
+@dataclass(slots=True)
+class _Request:
+    priority: int
+    name: str
+    operation: Callable[[], Awaitable[Any]]
+    key: Hashable | None
+    submitted: float
+    futures: list[asyncio.Future] = field(default_factory=list)
+    started: bool = False
+
+
+def _report(name: str, future: asyncio.Future):
+    # callers may not await what they submit, failures still get printed
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Discord {name} failed. {future.exception()}")
+
+
+class Outbound:
+    # queue for discord requests, runs at most concurrency of them at once,
+    # lowest priority first so cleanup never delays board updates, a
+    # request submitted with the key of one that has not started yet
+    # replaces its operation (superseded edits of the same message collapse)
+    def __init__(self, concurrency: int = 2):
+        self.concurrency = concurrency
+        self._heap: list[tuple[int, int, _Request]] = []
+        self._queued: dict[Hashable, _Request] = {}
+        self._order = count()
+        self._workers: set[asyncio.Task] = set()
+
+    def submit(
+        self,
+        priority: int,
+        name: str,
+        operation: Callable[[], Awaitable[R]],
+        key: Hashable | None = None,
+    ) -> asyncio.Future[R]:
+        future: asyncio.Future[R] = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda done: _report(name, done))
+        request = self._queued.get(key) if key is not None else None
+        if request is not None:
+            METRICS.inc("discord_collapsed", call=name)
+            request.operation = operation
+            request.futures.append(future)
+            if priority < request.priority:
+                request.priority = priority
+                heappush(self._heap, (priority, next(self._order), request))
+            return future
+        request = _Request(priority, name, operation, key, time.perf_counter(), [future])
+        if key is not None:
+            self._queued[key] = request
+        heappush(self._heap, (priority, next(self._order), request))
+        if len(self._workers) < self.concurrency:
+            self._workers.add(asyncio.create_task(self._work()))
+        return future
+
+    async def _work(self):
+        try:
+            while self._heap:
+                (_, _, request) = heappop(self._heap)
+                if request.started:
+                    # stale heap entry of a request that was bumped up
+                    continue
+                request.started = True
+                if request.key is not None:
+                    self._queued.pop(request.key, None)
+                METRICS.observe(
+                    "discord_queue_seconds", time.perf_counter() - request.submitted, call=request.name
+                )
+                try:
+                    with METRICS.timer("discord_seconds", call=request.name):
+                        result = await request.operation()
+                except Exception as e:
+                    for future in request.futures:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    for future in request.futures:
+                        if not future.done():
+                            future.set_result(result)
+        finally:
+            # leaves _workers before returning, with no await in between, so a
+            # submit that finds the heap drained always starts a new worker
+            worker = asyncio.current_task()
+            if worker is not None:
+                self._workers.discard(worker)
+
+    @property
+    def pending(self) -> int:
+        return sum(not request.started for (_, _, request) in self._heap)
+
+    def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        for _, _, request in self._heap:
+            for future in request.futures:
+                future.cancel()
+        self._heap.clear()
+        self._queued.clear()
@@ -1,12 +1,28 @@
-from dataclasses import dataclass, field
-import statistics
-from typing import Any
+from array import array
+import os
+import re
+import sys
+from operator import itemgetter
+from dataclasses import asdict, dataclass, field, fields, replace
+from typing import Any, ClassVar, Iterable, Iterator, Self, overload
+from mmap import mmap
+from dacite import Config
 
 from models.IOBoundDataclass import IOBoundDataclass
-from parsers.main import is_playfab_id_format
+from models.prefix import PrefixIndex
+from models.ranking import RankIndex
+from parsers.main import (
+    GateTable,
+    check_match_value,
+    is_playfab_id_format,
+    normalize_name,
+)
 
+# anything sliceable into bytes, a lazy MatchList reads its columns from one
+Buffer = bytes | memoryview | mmap
 
-@dataclass
+
+@dataclass(slots=True)
 class GameMatch:
     kills: int = 0
     deaths: int = 0
@@ -14,34 +30,371 @@ class GameMatch:
     score: int = 0
 
 
-@dataclass
+MATCH_COLUMNS = ("kills", "deaths", "structure_damage", "score")
+_match_row = itemgetter(*MATCH_COLUMNS)
+
+
+def check_match(match: GameMatch) -> GameMatch:
+    # raises ValueError before any column is touched, a value that does not
+    # fit the int32 columns would otherwise leave them of different lengths
+    for column in MATCH_COLUMNS:
+        check_match_value(column, getattr(match, column))
+    return match
+
+
+class MatchList:
+    # GameMatch sequence stored as one int array per column, indexing and
+    # iteration hand out GameMatch copies so edits must go through Player
+    # lazy lists (see MatchList.lazy) decode their columns on first access
+    __slots__ = ("_kills", "_deaths", "_structure_damage", "_score", "_source")
+
+    def __init__(self, matches: Iterable[GameMatch] = ()):
+        self._kills = array("i")
+        self._deaths = array("i")
+        self._structure_damage = array("i")
+        self._score = array("i")
+        self._source: tuple[Buffer, int, int, tuple[int, int, int, int]] | None = None
+        for match in matches:
+            self.append(match)
+
+    @classmethod
+    def lazy(
+        cls,
+        buffer: Buffer,
+        offset: int,
+        count: int,
+        sums: tuple[int, int, int, int],
+    ) -> "MatchList":
+        # count little endian int32 per column, one column after the other,
+        # starting at buffer[offset], sums are the known column totals
+        match_list = cls()
+        match_list._source = (buffer, offset, count, sums)
+        return match_list
+
+    def _materialize(self):
+        assert self._source is not None
+        (buffer, offset, count, _) = self._source
+        self._source = None
+        for index, column in enumerate(
+            (self._kills, self._deaths, self._structure_damage, self._score)
+        ):
+            start = offset + index * count * column.itemsize
+            column.frombytes(buffer[start: start + count * column.itemsize])
+            if sys.byteorder != "little":
+                column.byteswap()
+
+    @property
+    def loaded(self) -> bool:
+        return self._source is None
+
+    @property
+    def kills(self) -> array:
+        if self._source is not None:
+            self._materialize()
+        return self._kills
+
+    @property
+    def deaths(self) -> array:
+        if self._source is not None:
+            self._materialize()
+        return self._deaths
+
+    @property
+    def structure_damage(self) -> array:
+        if self._source is not None:
+            self._materialize()
+        return self._structure_damage
+
+    @property
+    def score(self) -> array:
+        if self._source is not None:
+            self._materialize()
+        return self._score
+
+    def sums(self) -> tuple[int, int, int, int]:
+        # kills, deaths, structure_damage, score totals, without decoding lazy lists
+        if self._source is not None:
+            return self._source[3]
+        return (
+            sum(self._kills),
+            sum(self._deaths),
+            sum(self._structure_damage),
+            sum(self._score),
+        )
+
+    def column_bytes(self, column: str) -> bytes:
+        # little endian int32 column, copied straight from the source when lazy
+        if self._source is not None:
+            (buffer, offset, count, _) = self._source
+            index = MATCH_COLUMNS.index(column)
+            return bytes(buffer[offset + index * count * 4: offset + (index + 1) * count * 4])
+        values: array = getattr(self, column)
+        if sys.byteorder != "little":
+            values = array("i", values)
+            values.byteswap()
+        return values.tobytes()
+
+    @classmethod
+    def from_dicts(cls, matches: list[dict[str, int]]) -> "MatchList":
+        # raises TypeError/OverflowError on values that are not 32 bit ints
+        match_list = cls()
+        if not matches:
+            return match_list
+        try:
+            rows = list(map(_match_row, matches))
+        except KeyError:
+            rows = [tuple(match.get(c, 0) for c in MATCH_COLUMNS) for match in matches]
+        for column, values in zip(MATCH_COLUMNS, zip(*rows)):
+            getattr(match_list, column).extend(values)
+        return match_list
+
+    def as_dicts(self) -> list[dict[str, int]]:
+        return [
+            {
+                "kills": kills,
+                "deaths": deaths,
+                "structure_damage": structure_damage,
+                "score": score,
+            }
+            for (kills, deaths, structure_damage, score) in zip(
+                self.kills, self.deaths, self.structure_damage, self.score
+            )
+        ]
+
+    def __len__(self) -> int:
+        if self._source is not None:
+            return self._source[2]
+        return len(self._score)
+
+    @overload
+    def __getitem__(self, index: int) -> GameMatch: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[GameMatch]: ...
+
+    def __getitem__(self, index: int | slice) -> GameMatch | list[GameMatch]:
+        if isinstance(index, slice):
+            return [
+                GameMatch(*row)
+                for row in zip(
+                    self.kills[index],
+                    self.deaths[index],
+                    self.structure_damage[index],
+                    self.score[index],
+                )
+            ]
+        return GameMatch(
+            self.kills[index],
+            self.deaths[index],
+            self.structure_damage[index],
+            self.score[index],
+        )
+
+    def __setitem__(self, index: int, match: GameMatch):
+        check_match(match)
+        self.kills[index] = match.kills
+        self.deaths[index] = match.deaths
+        self.structure_damage[index] = match.structure_damage
+        self.score[index] = match.score
+
+    def __iter__(self) -> Iterator[GameMatch]:
+        for row in zip(self.kills, self.deaths, self.structure_damage, self.score):
+            yield GameMatch(*row)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, MatchList):
+            return all(
+                getattr(self, column) == getattr(other, column)
+                for column in MATCH_COLUMNS
+            )
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"MatchList({list(self)!r})"
+
+    def append(self, match: GameMatch):
+        check_match(match)
+        self.kills.append(match.kills)
+        self.deaths.append(match.deaths)
+        self.structure_damage.append(match.structure_damage)
+        self.score.append(match.score)
+
+    def pop(self, index: int = -1) -> GameMatch:
+        return GameMatch(
+            self.kills.pop(index),
+            self.deaths.pop(index),
+            self.structure_damage.pop(index),
+            self.score.pop(index),
+        )
+
+    def take(self, count: int) -> "MatchList":
+        # removes the first count matches and returns them
+        taken = MatchList()
+        for column in MATCH_COLUMNS:
+            values: array = getattr(self, column)
+            getattr(taken, column).extend(values[:count])
+            del values[:count]
+        return taken
+
+    def copy(self) -> "MatchList":
+        if self._source is not None:
+            return MatchList.lazy(*self._source)
+        match_list = MatchList()
+        for column in MATCH_COLUMNS:
+            getattr(match_list, column).extend(getattr(self, column))
+        return match_list
+
+
+@dataclass(slots=True)
+class MatchSummary:
+    # totals of a player's archived matches, see LeaderBoard.close_season
+    matches: int = 0
+    kills: int = 0
+    deaths: int = 0
+    structure_damage: int = 0
+    score: int = 0
+
+    def as_list(self) -> list[int]:
+        return [self.matches, self.kills, self.deaths, self.structure_damage, self.score]
+
+
+@dataclass(slots=True)
 class Player:
     name: str
     playfab_id: str
-    matches: list[GameMatch] = field(default_factory=list)
+    matches: MatchList = field(default_factory=MatchList)
+    archived: MatchSummary = field(default_factory=MatchSummary)
+    # running totals of archived and current matches, kept in sync by
+    # add_match/set_match/pop_match/set_archived
+    _total_kills: int = field(init=False, repr=False, compare=False)
+    _total_deaths: int = field(init=False, repr=False, compare=False)
+    _total_score: int = field(init=False, repr=False, compare=False)
+    _total_structure_damage: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not isinstance(self.matches, MatchList):
+            self.matches = MatchList(self.matches)
+        (
+            self._total_kills,
+            self._total_deaths,
+            self._total_structure_damage,
+            self._total_score,
+        ) = self.matches.sums()
+        self._track_archived(self.archived, 1)
+
+    def _track_archived(self, archived: MatchSummary, sign: int):
+        self._total_kills += sign * archived.kills
+        self._total_deaths += sign * archived.deaths
+        self._total_score += sign * archived.score
+        self._total_structure_damage += sign * archived.structure_damage
+
+    def _track(self, match: GameMatch, sign: int):
+        self._total_kills += sign * match.kills
+        self._total_deaths += sign * match.deaths
+        self._total_score += sign * match.score
+        self._total_structure_damage += sign * match.structure_damage
+
+    def add_match(self, match: GameMatch):
+        self.matches.append(match)
+        self._track(match, 1)
+
+    def set_match(self, index: int, match: GameMatch):
+        previous = self.matches[index]
+        self.matches[index] = match
+        self._track(previous, -1)
+        self._track(match, 1)
+
+    def pop_match(self, index: int) -> GameMatch:
+        match = self.matches.pop(index)
+        self._track(match, -1)
+        return match
+
+    def set_archived(self, archived: MatchSummary):
+        self._track_archived(self.archived, -1)
+        self.archived = archived
+        self._track_archived(archived, 1)
+
+    def archive(self, count: int) -> MatchList:
+        # folds the first count matches into archived, totals stay the same
+        if count == len(self.matches):
+            (taken, self.matches) = (self.matches, MatchList())
+        else:
+            taken = self.matches.take(count)
+        (kills, deaths, structure_damage, score) = taken.sums()
+        self.archived = MatchSummary(
+            self.archived.matches + len(taken),
+            self.archived.kills + kills,
+            self.archived.deaths + deaths,
+            self.archived.structure_damage + structure_damage,
+            self.archived.score + score,
+        )
+        return taken
+
+    @property
+    def match_count(self) -> int:
+        # archived and current matches
+        return self.archived.matches + len(self.matches)
 
     @property
     def total_kills(self) -> int:
-        return sum([match.kills for match in self.matches])
+        return self._total_kills
 
     @property
     def total_deaths(self) -> int:
-        return sum([match.deaths for match in self.matches])
+        return self._total_deaths
 
     @property
     def total_score(self) -> int:
-        return sum([match.score for match in self.matches])
+        return self._total_score
 
     @property
     def avg_structure_damage(self) -> float:
-        return round(
-            statistics.mean([match.structure_damage for match in self.matches]), 2
-        )
+        if not self.match_count:
+            return 0
+        # whole means stay ints like statistics.mean gave them, shown as 20%
+        if self._total_structure_damage % self.match_count == 0:
+            return self._total_structure_damage // self.match_count
+        return round(self._total_structure_damage / self.match_count, 2)
 
     def as_dict(self) -> dict[str, Any]:
-        self_dict = self.__dict__.copy()
-        self_dict["matches"] = list(match.__dict__ for match in self.matches)
-        return self_dict
+        return {
+            "name": self.name,
+            "playfab_id": self.playfab_id,
+            "matches": self.matches.as_dicts(),
+        }
+
+    @classmethod
+    def from_data(cls, data: dict[str, Any]) -> "Player":
+        name = data.get("name")
+        playfab_id = data.get("playfab_id")
+        matches = data.get("matches", [])
+        if not isinstance(name, str) or not isinstance(playfab_id, str):
+            raise ValueError(f"Player name and playfab_id must be strings, got {data!r:.100}")
+        if not isinstance(matches, list):
+            raise ValueError(f"Matches of player {name} must be a list")
+        try:
+            return cls(name, playfab_id, MatchList.from_dicts(matches))
+        except (AttributeError, TypeError, OverflowError) as e:
+            raise ValueError(f"Invalid matches for player {name}. {e}") from e
+
+
+# discord caps autocomplete at 25 choices
+MAX_SUGGESTIONS = 25
+
+# board stored at the original ./persist/leaderboard.json, see LeaderBoard.named
+DEFAULT_BOARD = "default"
+
+LEADERBOARD_FIELDS = {
+    "journal_seq",
+    "players",
+    "max_items",
+    "rank_config",
+    "rank_short",
+    "season",
+    "archived",
+}
 
 
 @dataclass
@@ -50,10 +403,111 @@ class LeaderBoard(IOBoundDataclass):
     max_items: int = 30
     rank_config: dict[str, str] = field(default_factory=dict)
     rank_short: dict[str, str] | None = field(default_factory=dict)
+    season: int = 1
+    # playfab_id -> MatchSummary.as_list() of players with archived matches,
+    # the matches themselves are in the cold archive, see models.archive
+    archived: dict[str, list[int]] = field(default_factory=dict)
+    journaled: ClassVar[bool] = True
+    dacite_config: ClassVar[Config | None] = Config(
+        type_hooks={MatchList: MatchList.from_dicts}
+    )
+    board_name: ClassVar[str] = DEFAULT_BOARD
+    _named: ClassVar[dict[str, type["LeaderBoard"]]] = {}
+
+    @classmethod
+    def named(cls, name: str) -> type["LeaderBoard"]:
+        # one subclass per board, storage and the resident instance are both
+        # keyed by class so every board gets its own file and cache
+        if name == DEFAULT_BOARD:
+            return LeaderBoard
+        board_class = LeaderBoard._named.get(name)
+        if board_class is None:
+            if not re.fullmatch(r"[a-z0-9_-]{1,32}", name):
+                raise ValueError(
+                    f"Board name {name!r} must be 1-32 lowercase letters, digits, - or _"
+                )
+            board_class = type(f"LeaderBoard_{name}", (LeaderBoard,), {"board_name": name})
+            os.makedirs(os.path.dirname(board_class.get_path()), exist_ok=True)
+            LeaderBoard._named[name] = board_class
+        return board_class
+
+    @classmethod
+    def from_data(cls, data: dict[str, Any]) -> Self:
+        # hand written loader, dacite is only used for subclasses adding fields
+        if {f.name for f in fields(cls)} != LEADERBOARD_FIELDS:
+            return super().from_data(data)
+        players = data.get("players", [])
+        max_items = data.get("max_items", 30)
+        rank_config = data.get("rank_config", {})
+        rank_short = data.get("rank_short", {})
+        journal_seq = data.get("journal_seq", 0)
+        season = data.get("season", 1)
+        archived = data.get("archived", {})
+        if not isinstance(players, list) or not all(
+            isinstance(player, dict) for player in players
+        ):
+            raise ValueError("players must be a list of objects")
+        if not isinstance(max_items, int) or not isinstance(journal_seq, int):
+            raise ValueError("max_items and journal_seq must be integers")
+        if not isinstance(season, int):
+            raise ValueError("season must be an integer")
+        if not isinstance(archived, dict) or not all(
+            isinstance(summary, list)
+            and len(summary) == len(fields(MatchSummary))
+            and all(isinstance(value, int) for value in summary)
+            for summary in archived.values()
+        ):
+            raise ValueError("archived must map playfab ids to match summaries")
+        for gates in (rank_config, rank_short or {}):
+            if not isinstance(gates, dict) or not all(
+                isinstance(k, str) and isinstance(v, str) for (k, v) in gates.items()
+            ):
+                raise ValueError("rank_config and rank_short must map strings to strings")
+        return cls(
+            players=[Player.from_data(player) for player in players],
+            max_items=max_items,
+            rank_config=rank_config,
+            rank_short=rank_short,
+            season=season,
+            archived=archived,
+            journal_seq=journal_seq,
+        )
+
+    def __post_init__(self):
+        super().__post_init__()
+        # lookup indexes, first player wins if legacy data has duplicates
+        self._by_id: dict[str, Player] = {}
+        self._by_name: dict[str, Player] = {}
+        for player in self.players:
+            self._by_id.setdefault(player.playfab_id, player)
+            self._by_name.setdefault(normalize_name(player.name), player)
+        for playfab_id, summary in self.archived.items():
+            archived_player = self._by_id.get(playfab_id)
+            if archived_player is not None:
+                archived_player.set_archived(MatchSummary(*summary))
+        self._ranking = RankIndex(self.players)
+        # normalized names and playfab ids of the players get_player finds
+        self._prefixes = PrefixIndex(
+            [
+                *((name_key, player.name) for (name_key, player) in self._by_name.items()),
+                *((player_key.lower(), player_key) for player_key in self._by_id),
+            ]
+        )
+        self._gate_tables: dict[bool, GateTable] = {}
+
+    @property
+    def ranking(self) -> RankIndex:
+        return self._ranking
 
     @classmethod
     def get_path(cls) -> str:
-        return "./persist/leaderboard.json"
+        if cls.board_name == DEFAULT_BOARD:
+            return "./persist/leaderboard.json"
+        return f"./persist/boards/{cls.board_name}/leaderboard.json"
+
+    @classmethod
+    def get_archive_path(cls) -> str:
+        return os.path.splitext(cls.get_path())[0] + ".archive.jsonl"
 
     def as_dict(self) -> dict[str, Any]:
         self_dict = super().as_dict()
@@ -64,25 +518,196 @@ class LeaderBoard(IOBoundDataclass):
         aliases = self.rank_short or dict()
         return {k: aliases.get(k, v) for k, v in self.rank_config.items()}
 
+    def gate_table(self, aliased: bool = False) -> GateTable:
+        # compiled once per rank config, dropped by set_rank/del_rank
+        table = self._gate_tables.get(aliased)
+        if table is None:
+            table = GateTable(self.aliased_ranks() if aliased else self.rank_config)
+            self._gate_tables[aliased] = table
+        return table
+
     def get_player(self, playfab_or_user_name: str) -> Player | None:
         player: Player | None = None
         if is_playfab_id_format(playfab_or_user_name):
-            player = next(
-                (
-                    p
-                    for p in self.players
-                    if p.playfab_id == playfab_or_user_name.strip()
-                ),
-                None,
-            )
+            player = self._by_id.get(playfab_or_user_name.strip())
         if player is None:
-            arg_trimmed_normal = playfab_or_user_name.strip().lower()
-            player = next(
-                (
-                    p
-                    for p in self.players
-                    if p.name.strip().lower() == arg_trimmed_normal
-                ),
-                None,
-            )
+            player = self._by_name.get(normalize_name(playfab_or_user_name))
         return player
+
+    def _index_player(self, player: Player):
+        if player.playfab_id in self._by_id:
+            raise ValueError(f"Player with id {player.playfab_id} already exists")
+        name_key = normalize_name(player.name)
+        if name_key in self._by_name:
+            raise ValueError(f"Player with name {player.name} already exists")
+        self._by_id[player.playfab_id] = player
+        self._by_name[name_key] = player
+        self._prefixes.add(player.playfab_id.lower(), player.playfab_id)
+        self._prefixes.add(name_key, player.name)
+
+    def _unindex_player(self, player: Player):
+        name_key = normalize_name(player.name)
+        if self._by_id.get(player.playfab_id) is player:
+            del self._by_id[player.playfab_id]
+            duplicate = next(
+                (p for p in self.players if p.playfab_id == player.playfab_id), None
+            )
+            if duplicate:
+                self._by_id[player.playfab_id] = duplicate
+            else:
+                self._prefixes.remove(player.playfab_id.lower(), player.playfab_id)
+        if self._by_name.get(name_key) is player:
+            del self._by_name[name_key]
+            self._prefixes.remove(name_key, player.name)
+            duplicate = next(
+                (p for p in self.players if normalize_name(p.name) == name_key), None
+            )
+            if duplicate:
+                self._by_name[name_key] = duplicate
+                self._prefixes.add(name_key, duplicate.name)
+
+    def suggest_players(self, prefix: str, limit: int = MAX_SUGGESTIONS) -> list[str]:
+        # names and playfab ids starting with prefix, the top ranked names
+        # when there is no prefix yet
+        prefix = normalize_name(prefix)
+        if not prefix:
+            return [player.name for player in self._ranking.window(0, limit)]
+        return self._prefixes.search(prefix, limit)
+
+    def player_index(self, player: Player) -> int:
+        return next(index for index, p in enumerate(self.players) if p is player)
+
+    def apply(self, entry: dict[str, Any]) -> Any:
+        match entry["op"]:
+            case "add_player":
+                player = Player(entry["name"], entry["playfab_id"])
+                self._index_player(player)
+                self.players.append(player)
+                self._ranking.add(player)
+                return player
+            case "rm_player":
+                player = self.players.pop(entry["player"])
+                self._unindex_player(player)
+                self._ranking.remove(player)
+                if player.archived.matches:
+                    self.archived.pop(player.playfab_id, None)
+                return player
+            case "add_match":
+                player = self.players[entry["player"]]
+                player.add_match(GameMatch(**entry["match"]))
+                self._ranking.update(player)
+                return player
+            case "edit_match":
+                player = self.players[entry["player"]]
+                player.set_match(entry["match_index"], GameMatch(**entry["match"]))
+                self._ranking.update(player)
+                return player
+            case "del_match":
+                player = self.players[entry["player"]]
+                player.pop_match(entry["match_index"])
+                self._ranking.update(player)
+                return player
+            case "set_rank":
+                self.rank_config[str(entry["score_gate"])] = entry["rank_name"]
+                if entry.get("short_name"):
+                    if not self.rank_short:
+                        self.rank_short = dict()
+                    self.rank_short[str(entry["score_gate"])] = entry["short_name"]
+                self._gate_tables.clear()
+            case "del_rank":
+                self.rank_config.pop(str(entry["score_gate"]))
+                self._gate_tables.clear()
+            case "set_max_items":
+                self.max_items = entry["max_items"]
+            case "close_season":
+                archived = 0
+                for index, count in entry["counts"]:
+                    player = self.players[index]
+                    archived += len(player.archive(count))
+                    self.archived[player.playfab_id] = player.archived.as_list()
+                self.season += 1
+                return archived
+            case _:
+                raise ValueError(f"Unknown leaderboard operation {entry['op']}")
+
+    def add_player(self, name: str, playfab_id: str) -> Player:
+        return self.mutate({"op": "add_player", "name": name, "playfab_id": playfab_id})
+
+    def rm_player(self, player: Player) -> Player:
+        return self.mutate({"op": "rm_player", "player": self.player_index(player)})
+
+    def add_match(self, player: Player, match: GameMatch) -> Player:
+        return self.mutate(
+            {
+                "op": "add_match",
+                "player": self.player_index(player),
+                "match": asdict(match),
+            }
+        )
+
+    def edit_match(
+        self, player: Player, match_index: int, **changes: int | None
+    ) -> Player:
+        edited = replace(
+            player.matches[match_index],
+            **{k: v for k, v in changes.items() if v is not None},
+        )
+        return self.mutate(
+            {
+                "op": "edit_match",
+                "player": self.player_index(player),
+                "match_index": match_index,
+                "match": asdict(edited),
+            }
+        )
+
+    def del_match(self, player: Player, match_index: int) -> Player:
+        return self.mutate(
+            {
+                "op": "del_match",
+                "player": self.player_index(player),
+                "match_index": match_index,
+            }
+        )
+
+    def set_rank(self, score_gate: int, rank_name: str, short_name: str | None = None):
+        self.mutate(
+            {
+                "op": "set_rank",
+                "score_gate": score_gate,
+                "rank_name": rank_name,
+                "short_name": short_name,
+            }
+        )
+
+    def del_rank(self, score_gate: int):
+        self.mutate({"op": "del_rank", "score_gate": score_gate})
+
+    def set_max_items(self, max_items: int):
+        self.mutate({"op": "set_max_items", "max_items": max_items})
+
+    def season_matches(self) -> list[tuple[Player, MatchList]]:
+        # copies of the matches close_season would archive, to be written to
+        # the cold archive before the season is closed
+        return [
+            (player, player.matches.copy())
+            for player in self.players
+            if player.matches and self._by_id.get(player.playfab_id) is player
+        ]
+
+    def close_season(self, season: int, captured: list[tuple[Player, MatchList]]) -> int:
+        # archives the captured matches (see season_matches), fails when the
+        # board changed since they were captured so the archive stays exact
+        if season != self.season:
+            raise ValueError(f"Season {season} is already closed")
+        indexes = {id(player): index for (index, player) in enumerate(self.players)}
+        counts: list[list[int]] = []
+        for player, matches in captured:
+            index = indexes.get(id(player))
+            if index is None or not all(
+                getattr(player.matches, column)[: len(matches)] == getattr(matches, column)
+                for column in MATCH_COLUMNS
+            ):
+                raise ValueError(f"Matches of {player.name} changed while archiving, try again")
+            counts.append([index, len(matches)])
+        return self.mutate({"op": "close_season", "season": season, "counts": counts})
@@ -0,0 +1,33 @@
+from bisect import bisect_left, insort
+from typing import Iterable
+
+
+class PrefixIndex:
+    # (key, value) pairs kept sorted by key, the pairs whose key starts with a
+    # prefix are contiguous so a lookup is a bisect plus the matches it returns
+    def __init__(self, entries: Iterable[tuple[str, str]] = ()):
+        self._entries: list[tuple[str, str]] = sorted(entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: str, value: str):
+        insort(self._entries, (key, value))
+
+    def remove(self, key: str, value: str):
+        index = bisect_left(self._entries, (key, value))
+        if index < len(self._entries) and self._entries[index] == (key, value):
+            del self._entries[index]
+
+    def search(self, prefix: str, limit: int) -> list[str]:
+        # values of the first limit keys starting with prefix, without repeats
+        values: list[str] = []
+        index = bisect_left(self._entries, (prefix,))
+        while index < len(self._entries) and len(values) < limit:
+            (key, value) = self._entries[index]
+            if not key.startswith(prefix):
+                break
+            if value not in values:
+                values.append(value)
+            index += 1
+        return values
@@ -0,0 +1,101 @@
+import asyncio
+import cProfile
+from datetime import datetime, timezone
+import io
+import os
+import pstats
+import random
+import time
+import tracemalloc
+
+
+class CommandProfiler:
+    # samples rate of the invocations of one command with cProfile and
+    # tracemalloc, one sample at a time since both are process wide, so a
+    # sample also sees whatever else the event loop ran meanwhile
+    # every sample is a .prof (pstats) and a .txt report in directory, only
+    # the newest retention samples are kept
+    def __init__(self, directory: str = "./persist/profiles"):
+        self.directory = directory
+        self.command: str | None = None
+        self.rate = 0.0
+        self.retention = 20
+        self._active: tuple[int, str, cProfile.Profile, float, bool] | None = None
+        self._writes: set[asyncio.Task] = set()
+
+    def configure(self, command: str | None, rate: float = 0.1, retention: int = 20):
+        self.command = command.strip().lstrip("/") if command else None
+        self.rate = rate
+        self.retention = retention
+
+    def start(self, key: int, command: str):
+        if (
+            self.command is None
+            or command != self.command
+            or self._active is not None
+            or random.random() >= self.rate
+        ):
+            return
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        profile = cProfile.Profile()
+        self._active = (key, command, profile, time.perf_counter(), started_tracing)
+        profile.enable()
+
+    def stop(self, key: int):
+        if self._active is None or self._active[0] != key:
+            return
+        (_, command, profile, start, started_tracing) = self._active
+        profile.disable()
+        elapsed = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+        self._active = None
+        task = asyncio.create_task(
+            asyncio.to_thread(self.write, command, elapsed, profile, snapshot)
+        )
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    def write(
+        self,
+        command: str,
+        elapsed: float,
+        profile: cProfile.Profile,
+        snapshot: tracemalloc.Snapshot,
+    ):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+            base = os.path.join(self.directory, f"{stamp}-{command.replace(' ', '_')}")
+            profile.dump_stats(base + ".prof")
+            report = io.StringIO()
+            report.write(f"{command} took {elapsed * 1000:.1f}ms\n\n")
+            pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats(40)
+            report.write("top allocations\n")
+            snapshot = snapshot.filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                )
+            )
+            for stat in snapshot.statistics("lineno")[:25]:
+                report.write(f"{stat}\n")
+            with open(base + ".txt", "w", encoding="utf8") as report_file:
+                report_file.write(report.getvalue())
+            self.prune()
+        except Exception as e:
+            print(f"Failed to write {command} profile. {e}")
+
+    def prune(self):
+        samples = sorted({os.path.splitext(name)[0] for name in os.listdir(self.directory)})
+        for sample in samples[: max(0, len(samples) - self.retention)]:
+            for extension in (".prof", ".txt"):
+                path = os.path.join(self.directory, sample + extension)
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+PROFILER = CommandProfiler()
@@ -0,0 +1,65 @@
+from bisect import bisect_left
+from itertools import count
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from models.players import Player
+
+
+class RankIndex:
+    # players ordered by total_score desc, ties keep insertion order (same as a
+    # stable sorted(..., reverse=True) over the players list)
+    # keys are (-score, order) so rank queries are a bisect away
+    def __init__(self, players: list["Player"] | None = None):
+        self._order = count()
+        entries = [
+            ((-player.total_score, next(self._order)), player)
+            for player in players or []
+        ]
+        entries.sort(key=lambda entry: entry[0])
+        self._keys: list[tuple[int, int]] = [key for (key, _) in entries]
+        self._players: list["Player"] = [player for (_, player) in entries]
+        self._entries: dict[int, tuple[int, int]] = {
+            id(player): key for (key, player) in entries
+        }
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator["Player"]:
+        return iter(self._players)
+
+    def __contains__(self, player: "Player") -> bool:
+        return id(player) in self._entries
+
+    def add(self, player: "Player"):
+        self._insert(player, (-player.total_score, next(self._order)))
+
+    def remove(self, player: "Player"):
+        index = self.position(player)
+        del self._keys[index]
+        del self._players[index]
+        del self._entries[id(player)]
+
+    def update(self, player: "Player"):
+        # call after player's total_score changed, keeps its tie order
+        (neg_score, order) = self._entries[id(player)]
+        if -neg_score == player.total_score:
+            return
+        self.remove(player)
+        self._insert(player, (-player.total_score, order))
+
+    def _insert(self, player: "Player", key: tuple[int, int]):
+        index = bisect_left(self._keys, key)
+        self._keys.insert(index, key)
+        self._players.insert(index, player)
+        self._entries[id(player)] = key
+
+    def position(self, player: "Player") -> int:
+        return bisect_left(self._keys, self._entries[id(player)])
+
+    def count_above(self, score: int) -> int:
+        return bisect_left(self._keys, (-score,))
+
+    def window(self, start: int, stop: int) -> list["Player"]:
+        return self._players[max(0, start): max(0, stop)]
@@ -0,0 +1,122 @@
+from dataclasses import fields
+import json
+import mmap
+import struct
+import sys
+from typing import TypeVar
+
+from models.players import MATCH_COLUMNS, LeaderBoard, MatchList, Player
+
+# little endian binary snapshot of a LeaderBoard, laid out as
+#   header | meta json | strings | player table | match columns
+# each player row points at its name/playfab_id in strings and at its
+# matches (relative to the end of the table), stored as len(MATCH_COLUMNS)
+# int32 columns one after the other, rows also carry the column totals so
+# loading never touches match data
+# usage: python -m models.snapshot to-binary|to-json <input> <output>
+MAGIC = b"LBSNAP01"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIQQQ")
+PLAYER = struct.Struct("<IIIIqqqqIQ")
+
+B = TypeVar("B", bound=LeaderBoard)
+
+
+def encode_snapshot(board: LeaderBoard) -> bytes:
+    meta = json.dumps(
+        {f.name: getattr(board, f.name) for f in fields(board) if f.name != "players"}
+    ).encode("utf8")
+    strings = bytearray()
+    table = bytearray()
+    matches = bytearray()
+    for player in board.players:
+        name = player.name.encode("utf8")
+        playfab_id = player.playfab_id.encode("utf8")
+        table += PLAYER.pack(
+            len(strings),
+            len(name),
+            len(strings) + len(name),
+            len(playfab_id),
+            *player.matches.sums(),
+            len(player.matches),
+            len(matches),
+        )
+        strings += name + playfab_id
+        for column in MATCH_COLUMNS:
+            matches += player.matches.column_bytes(column)
+    strings_offset = HEADER.size + len(meta)
+    players_offset = strings_offset + len(strings)
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        len(board.players),
+        len(meta),
+        strings_offset,
+        len(strings),
+        players_offset,
+    )
+    return b"".join((header, meta, strings, table, matches))
+
+
+def read_snapshot(data_class: type[B], path: str) -> B:
+    # maps the file and decodes players only, match columns are read from the
+    # map the first time a player's matches are accessed
+    with open(path, "rb") as snapshot_file:
+        buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+    (magic, version, player_count, meta_size, strings_offset, strings_size, players_offset) = (
+        HEADER.unpack_from(buffer, 0)
+    )
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} leaderboard snapshot")
+    meta = json.loads(buffer[HEADER.size: HEADER.size + meta_size])
+    strings = buffer[strings_offset: strings_offset + strings_size]
+    matches_offset = players_offset + player_count * PLAYER.size
+    players = []
+    for (
+        name_offset,
+        name_size,
+        playfab_id_offset,
+        playfab_id_size,
+        kills,
+        deaths,
+        structure_damage,
+        score,
+        match_count,
+        player_matches_offset,
+    ) in struct.iter_unpack(
+        PLAYER.format, buffer[players_offset:matches_offset]
+    ):
+        players.append(
+            Player(
+                strings[name_offset: name_offset + name_size].decode("utf8"),
+                strings[playfab_id_offset: playfab_id_offset + playfab_id_size].decode("utf8"),
+                MatchList.lazy(
+                    buffer,
+                    matches_offset + player_matches_offset,
+                    match_count,
+                    (kills, deaths, structure_damage, score),
+                ),
+            )
+        )
+    return data_class(players=players, **meta)
+
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-binary", "to-json"):
+        print("usage: python -m models.snapshot to-binary|to-json <input> <output>")
+        sys.exit(1)
+    (_, direction, source, target) = sys.argv
+    if direction == "to-binary":
+        with open(source, "r", encoding="utf8") as source_file:
+            board = LeaderBoard.from_data(json.loads(source_file.read()))
+        with open(target, "wb") as target_file:
+            target_file.write(encode_snapshot(board))
+    else:
+        board = read_snapshot(LeaderBoard, source)
+        with open(target, "w", encoding="utf8") as target_file:
+            target_file.write(json.dumps(board.as_dict()))
+    print(f"Wrote {len(board.players)} players to {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+import asyncio
+from dataclasses import fields
+import json
+import os
+import sqlite3
+from typing import TYPE_CHECKING, Any, cast
+import aiofiles
+from aiofiles import os as aos
+from models.metrics import METRICS
+
+if TYPE_CHECKING:
+    from models.IOBoundDataclass import IOBoundDataclass
+    from models.players import LeaderBoard
+
+
+class Storage:
+    # persistence backend of an IOBoundDataclass subclass, see get_storage
+    def __init__(self, data_class: type["IOBoundDataclass"]):
+        self.data_class = data_class
+
+    def exists(self) -> bool:
+        raise NotImplementedError()
+
+    async def aexists(self) -> bool:
+        raise NotImplementedError()
+
+    def load(self) -> "IOBoundDataclass":
+        raise NotImplementedError()
+
+    async def aload(self) -> "IOBoundDataclass":
+        raise NotImplementedError()
+
+    def save(self, data: "IOBoundDataclass"):
+        raise NotImplementedError()
+
+    async def asave(self, data: "IOBoundDataclass"):
+        raise NotImplementedError()
+
+    async def acommit(self, data: "IOBoundDataclass", entries: list[dict[str, Any]]):
+        # persists entries already applied to data, full save by default
+        await self.asave(data)
+
+    @property
+    def compacting(self) -> bool:
+        # a background snapshot rewrite started by acommit is still running
+        return False
+
+    async def asize(self) -> int:
+        raise NotImplementedError()
+
+    def delete(self):
+        raise NotImplementedError()
+
+    async def adelete(self):
+        raise NotImplementedError()
+
+
+class JsonStorage(Storage):
+    # json snapshot at get_path, journaled classes append entries to
+    # get_journal_path and fold them into the snapshot past journal_threshold
+    def __init__(self, data_class: type["IOBoundDataclass"]):
+        super().__init__(data_class)
+        self._journal_size = 0
+        self._lock = asyncio.Lock()
+        self._compaction: asyncio.Task | None = None
+
+    @property
+    def path(self) -> str:
+        return self.data_class.get_path()
+
+    @property
+    def journal_path(self) -> str:
+        return self.data_class.get_journal_path()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    async def aexists(self):
+        exists = await aos.path.exists(self.path)
+        return exists
+
+    def encode(self, data: "IOBoundDataclass") -> bytes:
+        return json.dumps(data.as_dict()).encode("utf8")
+
+    def read_snapshot(self) -> "IOBoundDataclass":
+        with open(self.path, "r", encoding="utf8") as config_file:
+            json_data = json.loads(config_file.read())
+        return self.data_class.from_data(json_data)
+
+    async def aread_snapshot(self) -> "IOBoundDataclass":
+        async with aiofiles.open(self.path, "r", encoding="utf8") as config_file:
+            content = await config_file.read()
+        return self.data_class.from_data(json.loads(content))
+
+    def load(self):
+        # synchronous, async callers run it under _lock like aload
+        config_data = self.data_class()
+        if self.exists():
+            config_data = self.read_snapshot()
+        if self.data_class.journaled and os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf8") as journal_file:
+                content = journal_file.read()
+            self._journal_size = len(content.encode("utf8"))
+            if not config_data._replay(content.splitlines()):
+                self.save(config_data)
+        return config_data
+
+    async def aload(self):
+        # a compaction replacing the snapshot and emptying the journal between
+        # the two reads would drop the entries it folded in, so both are read
+        # under the lock it holds
+        async with self._lock:
+            return await self._aload()
+
+    async def _aload(self):
+        config_data = self.data_class()
+        exists = await self.aexists()
+        if exists:
+            config_data = await self.aread_snapshot()
+            snapshot_size = await aos.path.getsize(self.path)
+            METRICS.inc("storage_bytes", snapshot_size, op="read", storage=type(self).__name__)
+        if self.data_class.journaled and await aos.path.exists(self.journal_path):
+            async with aiofiles.open(
+                self.journal_path, "r", encoding="utf8"
+            ) as journal_file:
+                content = await journal_file.read()
+            self._journal_size = len(content.encode("utf8"))
+            METRICS.inc("storage_bytes", self._journal_size, op="read", storage=type(self).__name__)
+            if not config_data._replay(content.splitlines()):
+                await self._asave(config_data)
+        return config_data
+
+    def save(self, data: "IOBoundDataclass"):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as config_file:
+            config_file.write(self.encode(data))
+            config_file.flush()
+            os.fsync(config_file.fileno())
+        os.replace(tmp_path, self.path)
+        if data.journaled:
+            open(self.journal_path, "w").close()
+            self._journal_size = 0
+
+    async def asave(self, data: "IOBoundDataclass"):
+        async with self._lock:
+            await self._asave(data)
+
+    async def _asave(self, data: "IOBoundDataclass"):
+        snapshot = self.encode(data)
+        tmp_path = self.path + ".tmp"
+        async with aiofiles.open(tmp_path, "wb") as config_file:
+            await config_file.write(snapshot)
+            await config_file.flush()
+            await asyncio.to_thread(os.fsync, config_file.fileno())
+        await aos.replace(tmp_path, self.path)
+        METRICS.inc("storage_bytes", len(snapshot), op="write", storage=type(self).__name__)
+        if data.journaled:
+            # entries up to data.journal_seq are in the snapshot now
+            async with aiofiles.open(self.journal_path, "w", encoding="utf8"):
+                pass
+            self._journal_size = 0
+
+    async def acommit(self, data: "IOBoundDataclass", entries: list[dict[str, Any]]):
+        if not data.journaled:
+            await self.asave(data)
+            return
+        if not entries:
+            return
+        async with self._lock:
+            lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+            async with aiofiles.open(
+                self.journal_path, "a", encoding="utf8"
+            ) as journal_file:
+                await journal_file.write(lines)
+                await journal_file.flush()
+                await asyncio.to_thread(os.fsync, journal_file.fileno())
+            self._journal_size += len(lines.encode("utf8"))
+            METRICS.inc("storage_bytes", len(lines.encode("utf8")), op="append", storage=type(self).__name__)
+        if self._journal_size > data.journal_threshold and not self.compacting:
+            self._compaction = asyncio.create_task(self.acompact(data))
+
+    @property
+    def compacting(self) -> bool:
+        return self._compaction is not None and not self._compaction.done()
+
+    async def acompact(self, data: "IOBoundDataclass"):
+        try:
+            await self.asave(data)
+        except Exception as e:
+            print(f"Failed to compact {self.journal_path}. {e}")
+
+    async def asize(self):
+        file_size = 0
+        for path in (self.path, self.journal_path):
+            if await aos.path.exists(path):
+                file_size += await aos.path.getsize(path)
+        return file_size
+
+    def delete(self):
+        os.remove(self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    async def adelete(self):
+        await aos.remove(self.path)
+        if await aos.path.exists(self.journal_path):
+            await aos.remove(self.journal_path)
+
+
+class BinaryStorage(JsonStorage):
+    # JsonStorage with the snapshot in the models.snapshot format, the file is
+    # memory mapped on load and match columns are only decoded when accessed
+    # an existing json snapshot is converted the first time it is loaded
+    @property
+    def path(self) -> str:
+        return os.path.splitext(self.data_class.get_path())[0] + ".snapshot"
+
+    def encode(self, data: "IOBoundDataclass") -> bytes:
+        from models.snapshot import encode_snapshot
+
+        return encode_snapshot(cast("LeaderBoard", data))
+
+    def read_snapshot(self) -> "IOBoundDataclass":
+        from models.snapshot import read_snapshot
+
+        return read_snapshot(cast(type["LeaderBoard"], self.data_class), self.path)
+
+    async def aread_snapshot(self) -> "IOBoundDataclass":
+        return await asyncio.to_thread(self.read_snapshot)
+
+    def load(self):
+        if not self.exists():
+            legacy = JsonStorage(self.data_class)
+            if legacy.exists():
+                data = legacy.load()
+                self.save(data)
+                print(f"Converted {legacy.path} to {self.path}")
+                return data
+        return super().load()
+
+    async def aload(self):
+        async with self._lock:
+            exists = await self.aexists()
+            if not exists:
+                return await asyncio.to_thread(self.load)
+            return await self._aload()
+
+
+class SqliteStorage(Storage):
+    # players/matches tables for LeaderBoard shaped data, every other field
+    # is kept as json in meta, journal entries become row level transactions
+    # an existing json snapshot is imported the first time the db is created
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS players (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        playfab_id TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS players_playfab_id ON players (playfab_id);
+    CREATE INDEX IF NOT EXISTS players_name ON players (lower(trim(name)));
+    CREATE TABLE IF NOT EXISTS matches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        player_id INTEGER NOT NULL REFERENCES players (id) ON DELETE CASCADE,
+        kills INTEGER NOT NULL,
+        deaths INTEGER NOT NULL,
+        structure_damage INTEGER NOT NULL,
+        score INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS matches_player_id ON matches (player_id, id);
+    """
+    MATCH_COLUMNS = ("kills", "deaths", "structure_damage", "score")
+
+    def __init__(self, data_class: type["IOBoundDataclass"]):
+        super().__init__(data_class)
+        self._connection: sqlite3.Connection | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.splitext(self.data_class.get_path())[0] + ".sqlite3"
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.executescript(self.SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    async def aexists(self):
+        exists = await aos.path.exists(self.path)
+        return exists
+
+    def load(self):
+        if not self.exists():
+            legacy = JsonStorage(self.data_class)
+            if legacy.exists():
+                return self.migrate(legacy)
+        connection = self._connect()
+        data: dict[str, Any] = {
+            key: json.loads(value)
+            for (key, value) in connection.execute("SELECT key, value FROM meta")
+        }
+        players: dict[int, dict[str, Any]] = {}
+        for player_id, name, playfab_id in connection.execute(
+            "SELECT id, name, playfab_id FROM players ORDER BY id"
+        ):
+            players[player_id] = {"name": name, "playfab_id": playfab_id, "matches": []}
+        for player_id, *match in connection.execute(
+            f"SELECT player_id, {', '.join(self.MATCH_COLUMNS)} FROM matches ORDER BY player_id, id"
+        ):
+            players[player_id]["matches"].append(dict(zip(self.MATCH_COLUMNS, match)))
+        data["players"] = list(players.values())
+        return self.data_class.from_data(data)
+
+    async def aload(self):
+        async with self._lock:
+            return await asyncio.to_thread(self.load)
+
+    def migrate(self, legacy: Storage) -> "IOBoundDataclass":
+        data = legacy.load()
+        self.save(data)
+        (players, matches, score, kills, deaths) = self._connect().execute(
+            "SELECT (SELECT COUNT(*) FROM players), COUNT(*), TOTAL(score), TOTAL(kills), TOTAL(deaths) FROM matches"
+        ).fetchone()
+        expected = data.as_dict()["players"]
+        if (players, matches, score, kills, deaths) != (
+            len(expected),
+            sum(len(p["matches"]) for p in expected),
+            sum(m["score"] for p in expected for m in p["matches"]),
+            sum(m["kills"] for p in expected for m in p["matches"]),
+            sum(m["deaths"] for p in expected for m in p["matches"]),
+        ):
+            self._close()
+            os.remove(self.path)
+            raise ValueError(f"Migration to {self.path} does not match {legacy.data_class.get_path()}")
+        print(f"Migrated {players} players and {matches} matches to {self.path}")
+        return data
+
+    def _write_meta(self, connection: sqlite3.Connection, data: "IOBoundDataclass"):
+        # straight from the fields, as_dict would serialize every match
+        connection.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [
+                (f.name, json.dumps(getattr(data, f.name)))
+                for f in fields(data)
+                if f.name != "players"
+            ],
+        )
+
+    def _insert_matches(
+        self, connection: sqlite3.Connection, player_id: int, matches: list[dict]
+    ):
+        connection.executemany(
+            f"INSERT INTO matches (player_id, {', '.join(self.MATCH_COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+            [
+                (player_id, *(match[column] for column in self.MATCH_COLUMNS))
+                for match in matches
+            ],
+        )
+
+    def save(self, data: "IOBoundDataclass"):
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM matches")
+            connection.execute("DELETE FROM players")
+            for player in data.as_dict()["players"]:
+                cursor = connection.execute(
+                    "INSERT INTO players (name, playfab_id) VALUES (?, ?)",
+                    (player["name"], player["playfab_id"]),
+                )
+                assert cursor.lastrowid is not None
+                self._insert_matches(connection, cursor.lastrowid, player["matches"])
+            self._write_meta(connection, data)
+
+    async def asave(self, data: "IOBoundDataclass"):
+        async with self._lock:
+            await asyncio.to_thread(self.save, data)
+
+    @staticmethod
+    def _nth(connection: sqlite3.Connection, query: str, params: tuple, index: int) -> int:
+        # row id of the index-th row (python semantics) ordered by id
+        if index < 0:
+            (total,) = connection.execute(
+                f"SELECT COUNT(*) FROM ({query})", params
+            ).fetchone()
+            index += total
+        row = None
+        if index >= 0:
+            row = connection.execute(
+                f"{query} ORDER BY id LIMIT 1 OFFSET ?", (*params, index)
+            ).fetchone()
+        if row is None:
+            raise IndexError(f"No row {index} for {query}")
+        return row[0]
+
+    def _player_id(self, connection: sqlite3.Connection, index: int) -> int:
+        return self._nth(connection, "SELECT id FROM players", (), index)
+
+    def _match_id(self, connection: sqlite3.Connection, player_id: int, index: int) -> int:
+        return self._nth(
+            connection, "SELECT id FROM matches WHERE player_id = ?", (player_id,), index
+        )
+
+    def commit(self, data: "IOBoundDataclass", entries: list[dict[str, Any]]):
+        connection = self._connect()
+        with connection:
+            for entry in entries:
+                match entry["op"]:
+                    case "add_player":
+                        connection.execute(
+                            "INSERT INTO players (name, playfab_id) VALUES (?, ?)",
+                            (entry["name"], entry["playfab_id"]),
+                        )
+                    case "rm_player":
+                        connection.execute(
+                            "DELETE FROM players WHERE id = ?",
+                            (self._player_id(connection, entry["player"]),),
+                        )
+                    case "add_match":
+                        self._insert_matches(
+                            connection,
+                            self._player_id(connection, entry["player"]),
+                            [entry["match"]],
+                        )
+                    case "edit_match":
+                        match_id = self._match_id(
+                            connection,
+                            self._player_id(connection, entry["player"]),
+                            entry["match_index"],
+                        )
+                        connection.execute(
+                            f"UPDATE matches SET {', '.join(f'{c} = ?' for c in self.MATCH_COLUMNS)} WHERE id = ?",
+                            (
+                                *(entry["match"][c] for c in self.MATCH_COLUMNS),
+                                match_id,
+                            ),
+                        )
+                    case "del_match":
+                        match_id = self._match_id(
+                            connection,
+                            self._player_id(connection, entry["player"]),
+                            entry["match_index"],
+                        )
+                        connection.execute("DELETE FROM matches WHERE id = ?", (match_id,))
+                    case "close_season":
+                        player_ids = [
+                            player_id
+                            for (player_id,) in connection.execute(
+                                "SELECT id FROM players ORDER BY id"
+                            )
+                        ]
+                        for index, count in entry["counts"]:
+                            connection.execute(
+                                "DELETE FROM matches WHERE id IN (SELECT id FROM matches WHERE player_id = ? ORDER BY id LIMIT ?)",
+                                (player_ids[index], count),
+                            )
+            self._write_meta(connection, data)
+
+    async def acommit(self, data: "IOBoundDataclass", entries: list[dict[str, Any]]):
+        async with self._lock:
+            await asyncio.to_thread(self.commit, data, entries)
+
+    async def asize(self):
+        file_size = 0
+        for path in (self.path, self.path + "-wal"):
+            if await aos.path.exists(path):
+                file_size += await aos.path.getsize(path)
+        return file_size
+
+    def delete(self):
+        self._close()
+        for path in (self.path, self.path + "-wal", self.path + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def adelete(self):
+        async with self._lock:
+            await asyncio.to_thread(self.delete)
+
+
+STORAGE_BACKENDS: dict[str, type[Storage]] = {
+    "json": JsonStorage,
+    "binary": BinaryStorage,
+    "sqlite": SqliteStorage,
+}
@@ -0,0 +1,71 @@
+import asyncio
+from typing import Any, Callable, Generic, TypeVar
+from models.IOBoundDataclass import IOBoundDataclass
+
+T = TypeVar("T", bound=IOBoundDataclass)
+R = TypeVar("R")
+
+
+class Writer(Generic[T]):
+    # single task owning mutations of the resident data_class instance,
+    # operations run in submit order and everything queued within
+    # commit_window seconds is persisted by one acommit
+    def __init__(self, data_class: type[T], commit_window: float = 0.05):
+        self.data_class = data_class
+        self.commit_window = commit_window
+        self._queue: asyncio.Queue[tuple[Callable[[T], Any], asyncio.Future]] = (
+            asyncio.Queue()
+        )
+        self._task: asyncio.Task | None = None
+        self._applying = False
+
+    @property
+    def idle(self) -> bool:
+        # nothing queued or being applied, the resident instance can be dropped
+        return self._queue.empty() and not self._applying
+
+    async def submit(self, operation: Callable[[T], R]) -> R:
+        # operation runs against the resident instance and must not await,
+        # its result (or exception) is handed back once it is committed
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        future: asyncio.Future[R] = asyncio.get_running_loop().create_future()
+        await self._queue.put((operation, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            self._applying = True
+            await asyncio.sleep(self.commit_window)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._apply(batch)
+            except Exception as e:
+                print(f"Writer failed to apply {len(batch)} operations. {e}")
+            finally:
+                self._applying = False
+
+    async def _apply(self, batch: list[tuple[Callable[[T], Any], asyncio.Future]]):
+        outcomes: list[tuple[asyncio.Future, Any, Exception | None]] = []
+        try:
+            data = await self.data_class.aget()
+            for operation, future in batch:
+                try:
+                    outcomes.append((future, operation(data), None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+            await data.acommit()
+        except Exception as e:
+            # every caller sees the failure, so none of the batch may stay
+            # applied, the next aget reloads what was committed before it
+            self.data_class.invalidate()
+            outcomes = [(future, None, e) for (_, future) in batch]
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -0,0 +1,197 @@
+from collections import OrderedDict
+import math
+from typing import Callable, Iterator, TypeVar, cast
+from wcwidth import width
+from models.metrics import METRICS
+from models.players import LeaderBoard, Player
+from parsers.main import GateTable, iter_chunks
+
+TABLE_HEADER = ["#", "Name", "Rank", "Score", "K", "D"]
+# discord message content limit
+MESSAGE_SIZE = 2000
+
+
+def custom_format(number: float, precision: int):
+    if number == 0:
+        return "0"
+    elif number < 1:
+        return f"{number:.{precision}f}".rstrip("0").rstrip(".")
+    else:
+        integer_part = int(number)
+        decimal_part = number - integer_part
+        if decimal_part == 0:
+            return str(integer_part)
+        else:
+            return f"{integer_part}.{str(decimal_part)[2:precision+2]}"
+
+
+def human_format(number: int, min: int = 1000) -> str:
+    if number < min:
+        return str(number)
+    units = ["", "K", "M", "G", "T", "P"]
+    k = 1000.0
+    magnitude = int(math.floor(math.log(number, k)))
+    formatted_number = custom_format(number / k**magnitude, 1)
+    return "{}{}".format(formatted_number, units[magnitude])
+
+
+def get_row(player_data: Player, rank_txt: str | None):
+    kills: int = player_data.total_kills
+    deaths: int = player_data.total_deaths
+    score = player_data.total_score
+    return [
+        player_data.name,
+        rank_txt or "None",
+        score,
+        kills,
+        deaths,
+    ]
+
+
+def get_body(
+    players: list[Player],
+    gates: GateTable,
+    start: int = 0,
+    limit: int = 10,
+    sort: bool = True,
+) -> list[list[str]]:
+    top_players = (
+        sorted(players, key=lambda x: x.total_score, reverse=True)
+        if sort
+        else list(players)
+    )[:limit]
+    rank_txts = gates.current_labels(p.total_score for p in top_players)
+    board_data = [
+        get_row(value, rank_txt) for (value, rank_txt) in zip(top_players, rank_txts)
+    ]
+    return [
+        [
+            str(start + index + 1),
+            dt[0],
+            dt[1],
+            human_format(dt[2], 10000),
+            human_format(dt[3], 10000),
+            human_format(dt[4], 10000),
+        ]
+        for (index, dt) in enumerate(board_data)
+    ]
+
+
+def _cell(text: str, text_width: int, column_width: int) -> str:
+    # centered with one space of padding, extra space goes right (table2ascii default)
+    before = (column_width - text_width - 2) // 2
+    return " " * (before + 1) + text + " " * (column_width - text_width - before - 1)
+
+
+def iter_table(header: list[str], body: list[list[str]]) -> Iterator[str]:
+    # lines of the table table2ascii renders by default, widths are measured
+    # once and rows are formatted as they are consumed
+    header_widths = [width(text) for text in header]
+    body_widths = [[width(text) for text in row] for row in body]
+    column_widths = [
+        max(column) + 2 for column in zip(header_widths, *body_widths)
+    ]
+    inner_width = sum(column_widths) + len(column_widths) - 1
+
+    def line(row: list[str], row_widths: list[int]) -> str:
+        return "║" + " ".join(
+            _cell(text, text_width, column_width)
+            for (text, text_width, column_width) in zip(row, row_widths, column_widths)
+        ) + "║"
+
+    yield "╔" + "═" * inner_width + "╗"
+    yield line(header, header_widths)
+    yield "╟" + "─" * inner_width + "╢"
+    for row, row_widths in zip(body, body_widths):
+        yield line(row, row_widths)
+    yield "╚" + "═" * inner_width + "╝"
+
+
+def get_table(
+    players: list[Player],
+    gates: GateTable,
+    start: int = 0,
+    limit: int = 10,
+    sort: bool = True,
+) -> str:
+    return "\n".join(
+        iter_table(TABLE_HEADER, get_body(players, gates, start, limit, sort))
+    )
+
+
+def get_table_chunks(
+    players: list[Player],
+    gates: GateTable,
+    start: int = 0,
+    limit: int = 10,
+    sort: bool = True,
+    message_size: int = MESSAGE_SIZE,
+) -> list[str]:
+    # the table as code block messages of at most message_size characters,
+    # packed line by line without building the whole table first
+    fence_size = len("```\n\n```")
+    return [
+        "```\n" + chunk + "```"
+        for chunk in iter_chunks(
+            iter_table(TABLE_HEADER, get_body(players, gates, start, limit, sort)),
+            message_size - fence_size,
+        )
+    ]
+
+
+R = TypeVar("R", str, list[str])
+
+
+class RenderCache:
+    # LRU of rendered ranking windows, only valid for one board version
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._version: int | None = None
+        self._tables: OrderedDict[tuple[int, int, int, bool, str], str | list[str]] = (
+            OrderedDict()
+        )
+
+    def clear(self):
+        self._version = None
+        self._tables.clear()
+
+    def get_table(
+        self, board: LeaderBoard, start: int, stop: int, aliased: bool = True
+    ) -> str:
+        return self._render(get_table, board, start, stop, aliased)
+
+    def get_chunks(
+        self, board: LeaderBoard, start: int, stop: int, aliased: bool = True
+    ) -> list[str]:
+        return self._render(get_table_chunks, board, start, stop, aliased)
+
+    def _render(
+        self,
+        render: Callable[..., R],
+        board: LeaderBoard,
+        start: int,
+        stop: int,
+        aliased: bool,
+    ) -> R:
+        if board.version != self._version:
+            self._tables.clear()
+            self._version = board.version
+        key = (board.version, start, stop, aliased, render.__name__)
+        table = self._tables.get(key)
+        if table is not None:
+            self._tables.move_to_end(key)
+            METRICS.inc("render_cache", result="hit", render=render.__name__)
+            return cast(R, table)
+        METRICS.inc("render_cache", result="miss", render=render.__name__)
+        with METRICS.timer("render_seconds", render=render.__name__):
+            table = render(
+                board.ranking.window(start, stop),
+                board.gate_table(aliased),
+                start,
+                stop - start,
+                sort=False,
+            )
+        self._tables[key] = table
+        if len(self._tables) > self.max_size:
+            self._tables.popitem(last=False)
+        return table
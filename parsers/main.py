@@ -1,51 +1,66 @@
+from bisect import bisect_right
+import csv
+from dataclasses import dataclass
+import hashlib
+import io
+import json
 import re
-import numpy as np
+from typing import Any, Iterable, Iterator
 
 
 def is_playfab_id_format(arg: str):
     return re.search(r"^([\S]{14,16})+$", arg) is not None
 
 
-def compute_gate(value: int, gates: list[int]) -> int | None:
-    # todo: ditch numpy alltogether
-    # we could sort it by highest and then do next([x for x in keys if x <= minutes_played])
-    np_gates = np.array(gates)
-    lesser_gates = np_gates[np_gates <= value]
-    if len(lesser_gates) == 0:
-        return None
-    current_gate = lesser_gates.max()
-    return current_gate
+def normalize_name(name: str) -> str:
+    return name.strip().lower()
 
 
-def compute_next_gate(value: int, gates: list[int]) -> int | None:
-    # todo: ditch numpy alltogether
-    # we could sort it by highest and then do next([x for x in keys if x <= minutes_played])
-    np_gates = np.array(gates)
-    lesser_gates = np_gates[np_gates > value]
-    if len(lesser_gates) == 0:
-        return None
-    next_gate = lesser_gates.min()
-    return next_gate
+def content_hash(content: str) -> str:
+    return hashlib.sha1(content.encode("utf8")).hexdigest()
+
+
+class GateTable:
+    # gates compiled once into sorted thresholds, lookups are a bisect
+    def __init__(self, gates: dict[str, str]):
+        compiled = sorted(
+            (int(key), txt) for (key, txt) in gates.items() if key.isnumeric()
+        )
+        self.thresholds = [threshold for (threshold, _) in compiled]
+        self.labels = [txt for (_, txt) in compiled]
+
+    def current(self, value: int) -> tuple[int | None, str | None]:
+        index = bisect_right(self.thresholds, value) - 1
+        if index < 0:
+            return (None, None)
+        return (self.thresholds[index], self.labels[index])
+
+    def next(self, value: int) -> tuple[int | None, str | None]:
+        index = bisect_right(self.thresholds, value)
+        if index >= len(self.thresholds):
+            return (None, None)
+        return (self.thresholds[index], self.labels[index])
+
+    def current_labels(self, values: Iterable[int]) -> list[str | None]:
+        thresholds = self.thresholds
+        labels = self.labels
+        resolved: list[str | None] = []
+        for value in values:
+            index = bisect_right(thresholds, value) - 1
+            resolved.append(labels[index] if index >= 0 else None)
+        return resolved
 
 
 def compute_gate_text(
     value: int, gates: dict[str, str]
 ) -> tuple[int | None, str | None]:
-    gates_keys = list(gates.keys())
-    gates_thresholds = list([int(key) for key in gates_keys if key.isnumeric()])
-    current_gate = compute_gate(value, gates_thresholds)
-    gate_txt = gates.get(str(current_gate), None)
-    return (current_gate, gate_txt)
+    return GateTable(gates).current(value)
 
 
 def compute_next_gate_text(
     value: int, gates: dict[str, str]
 ) -> tuple[int | None, str | None]:
-    gates_keys = list(gates.keys())
-    gates_thresholds = list([int(key) for key in gates_keys if key.isnumeric()])
-    next_gate = compute_next_gate(value, gates_thresholds)
-    gate_txt = gates.get(str(next_gate), None)
-    return (next_gate, gate_txt)
+    return GateTable(gates).next(value)
 
 
 # source https://stackoverflow.com/questions/9647202/ordinal-numbers-replacement
@@ -66,17 +81,138 @@ def sizeof_fmt(num, suffix="B"):
     return f"{num:.1f}Yi{suffix}"
 
 
+def iter_chunks(lines: Iterable[str], chunk_size: int) -> Iterator[str]:
+    # packs lines into newline terminated chunks shorter than chunk_size, a
+    # line too long for that still gets a chunk of its own
+    batch: list[str] = []
+    batch_size = 0
+    for line in lines:
+        line_size = len(line) + 1
+        if batch and batch_size + line_size >= chunk_size:
+            yield "\n".join(batch) + "\n"
+            batch = []
+            batch_size = 0
+        batch.append(line)
+        batch_size += line_size
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
 def split_chunks(sample: str, chunk_size: int) -> list[str]:
-    lines = sample.splitlines()
-    batches: list[str] = []
-    while lines:
-        curr = lines.pop(0) + "\n"
-        if not batches:
-            batches.append(curr)
-        else:
-            new_len = len(batches[-1] + curr)
-            if new_len < chunk_size:
-                batches[-1] += curr
+    return list(iter_chunks(sample.splitlines(), chunk_size))
+
+
+@dataclass
+class MatchRow:
+    line: int
+    playfab_or_user_name: str
+    score: int = 0
+    kills: int = 0
+    deaths: int = 0
+    structure_damage: int = 0
+
+
+# match values are stored as 32 bit ints, see models.players.MatchList
+MATCH_VALUE_MIN = -(2**31)
+MATCH_VALUE_MAX = 2**31 - 1
+
+
+def check_match_value(key: str, value: int) -> int:
+    if not MATCH_VALUE_MIN <= value <= MATCH_VALUE_MAX:
+        raise ValueError(
+            f"{key} must be between {MATCH_VALUE_MIN} and {MATCH_VALUE_MAX}, got {value}"
+        )
+    return value
+
+
+MATCH_ROW_FIELDS = ["playfab_or_user_name", "score", "kills", "deaths", "structure_damage"]
+MATCH_ROW_ALIASES = {
+    "name": "playfab_or_user_name",
+    "user_name": "playfab_or_user_name",
+    "playfab_id": "playfab_or_user_name",
+    "player": "playfab_or_user_name",
+    "structure_damage_percent": "structure_damage",
+}
+
+
+def match_row_field(key: Any) -> str | None:
+    name = str(key).strip().lower()
+    name = MATCH_ROW_ALIASES.get(name, name)
+    return name if name in MATCH_ROW_FIELDS else None
+
+
+def is_int_cell(cell: str) -> bool:
+    return cell.strip().lstrip("-").isdigit()
+
+
+def parse_match_row(line: int, raw: Any) -> MatchRow:
+    if isinstance(raw, dict):
+        values: dict[str, Any] = {}
+        unknown: list[str] = []
+        for k, v in raw.items():
+            field = match_row_field(k)
+            if field is None:
+                unknown.append(repr(k))
             else:
-                batches.append(curr)
-    return batches
+                values[field] = v
+        if unknown:
+            # a misspelled column would import its values as 0
+            raise ValueError(f"unknown columns {', '.join(unknown)}")
+    elif isinstance(raw, list):
+        if len(raw) > len(MATCH_ROW_FIELDS):
+            raise ValueError(f"expected at most {len(MATCH_ROW_FIELDS)} columns, got {len(raw)}")
+        values = dict(zip(MATCH_ROW_FIELDS, raw))
+    else:
+        raise ValueError("expected an object or a list of values")
+    name = str(values.get("playfab_or_user_name") or "").strip()
+    if not name:
+        raise ValueError("missing playfab_or_user_name")
+    numbers: dict[str, int] = {}
+    for key in MATCH_ROW_FIELDS[1:]:
+        value = values.get(key)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            numbers[key] = 0
+            continue
+        try:
+            number = int(str(value).strip())
+        except ValueError:
+            raise ValueError(f"{key} must be an integer, got {value!r}")
+        numbers[key] = check_match_value(key, number)
+    return MatchRow(line, name, **numbers)
+
+
+def parse_match_rows(content: str, file_name: str) -> tuple[list[MatchRow], list[str]]:
+    # csv (optional header) or json list of objects/lists with
+    # playfab_or_user_name, score, kills, deaths, structure_damage
+    raw_rows: list[tuple[int, Any]] = []
+    if file_name.lower().endswith(".json"):
+        data = json.loads(content)
+        if not isinstance(data, list):
+            raise ValueError("JSON import must be a list of rows")
+        raw_rows = list(enumerate(data, start=1))
+    else:
+        records = [
+            (line, record)
+            for (line, record) in enumerate(csv.reader(io.StringIO(content)), start=1)
+            if any(cell.strip() for cell in record)
+        ]
+        first = records[0][1] if records else []
+        fields = [match_row_field(cell) for cell in first]
+        if first and all(fields):
+            header = records.pop(0)[1]
+            raw_rows = [(line, dict(zip(header, record))) for (line, record) in records]
+        elif any(fields) and not any(is_int_cell(cell) for cell in first[1:]):
+            # a header with a misspelled column, rejected as a whole so its
+            # values don't all import as 0
+            unknown = [repr(cell) for (cell, field) in zip(first, fields) if field is None]
+            raise ValueError(f"unknown columns {', '.join(unknown)} in the header")
+        else:
+            raw_rows = records
+    rows: list[MatchRow] = []
+    errors: list[str] = []
+    for line, raw in raw_rows:
+        try:
+            rows.append(parse_match_row(line, raw))
+        except ValueError as e:
+            errors.append(f"Row {line}: {e}")
+    return (rows, errors)
@@ -0,0 +1,45 @@
+from typing import Callable, Iterator, Sequence, cast, overload
+from discord.ext.pages import Page
+
+
+class LazyPages(Sequence[Page]):
+    # Paginator pages built by make_page(index) the first time they are shown
+    def __init__(self, size: int, make_page: Callable[[int], Page]):
+        self.size = size
+        self.make_page = make_page
+        self._pages: dict[int, Page] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    @overload
+    def __getitem__(self, index: int) -> Page: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Page]: ...
+
+    def __getitem__(self, index: int | slice) -> Page | list[Page]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(f"Page {index} out of range")
+        page = self._pages.get(index)
+        if page is None:
+            page = self.make_page(index)
+            self._pages[index] = page
+        return page
+
+    def __iter__(self) -> Iterator[Page]:
+        for index in range(self.size):
+            yield self[index]
+
+    def as_list(self) -> list[Page]:
+        # Paginator is typed for lists but only indexes, counts and iterates
+        # its pages (until the first non PageGroup), so this stays lazy
+        return cast(list[Page], self)
+
+
+def page_count(items: int, page_size: int) -> int:
+    return -(-items // page_size)